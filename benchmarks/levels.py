@@ -0,0 +1,35 @@
+"""
+Synthetic levels in the `Board.read_level` text format.
+"""
+import random
+
+
+# width, depth and height of the generated levels by name.
+SIZES = {
+    'small': (16, 16, 1),
+    'medium': (32, 32, 1),
+    'large': (64, 64, 1),
+    'tall': (32, 32, 3),
+    'huge': (320, 320, 1),
+}
+
+
+def generate_level(width: int, depth: int, height: int = 1,
+                   wall_rate: float = 0.2, seed: int = 0) -> str:
+    """
+    Generate a level of width x depth tiles on height z-slices.
+
+    :param wall_rate: part of the tiles having walls.
+    :param seed: seed of the random generator, the same seed always
+                 gives the same level.
+    """
+    rng = random.Random(seed)
+    slices = []
+    for _ in range(height):
+        lines = []
+        for _ in range(depth):
+            lines.append(''.join(
+                rng.choice('xyb') if rng.random() < wall_rate else 'w'
+                for _ in range(width)))
+        slices.append('\n'.join(lines))
+    return '\n\n'.join(slices) + '\n'
@@ -0,0 +1,267 @@
+"""
+Benchmarks of the board engine.
+
+They run on the SDL dummy video driver, so no window is opened::
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --sizes small medium --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from pg_iso.__main__ import SCREEN_HEIGHT, SCREEN_WIDTH, get_board
+from pg_iso.board import Board, Char, HoverTracker
+from pg_iso.level import Level
+from pg_iso.reachability import compute_area
+from pg_iso.threat import compute_threats
+
+from .levels import SIZES, generate_level
+
+
+SCENARIOS = {}
+
+
+def scenario(func):
+    """
+    Register a scenario.
+
+    A scenario takes the level text and the board built from it, and
+    returns the callable to time.
+    """
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+def random_positions(board, number, seed=0):
+    rng = random.Random(seed)
+    items = list(board.group)
+    return [(item.x, item.y, item.z) for item in rng.choices(items, k=number)]
+
+
+@scenario
+def read_level(level, board):
+    return lambda: Board.read_level(level)
+
+
+@scenario
+def level_from_text(level, board):
+    return lambda: Level.from_text(level)
+
+
+@scenario
+def level_load_cached(level, board):
+    cache_dir = os.path.join(tempfile.gettempdir(), 'pg_iso_bench_levels')
+    Level.load_cached(level, cache_dir)
+    return lambda: Level.load_cached(level, cache_dir)
+
+
+@scenario
+def compute_image_size(level, board):
+    return board.compute_image_size
+
+
+@scenario
+def place_cubes(level, board):
+    return board._place_cubes
+
+
+@scenario
+def rotate(level, board):
+    return board.rotate
+
+
+@scenario
+def draw_full(level, board):
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    board.draw(screen)
+    return lambda: board.draw(screen)
+
+
+@scenario
+def draw_dirty(level, board):
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    board.draw(screen)
+    boxes = [board.pick((x, y))
+             for x in range(40, SCREEN_WIDTH, 97)
+             for y in range(40, SCREEN_HEIGHT, 53)]
+    boxes = [box for box in dict.fromkeys(boxes) if box is not None]
+
+    def run():
+        board.set_highlighted(boxes)
+        board.draw(screen, full=False)
+        board.set_highlighted(())
+        board.draw(screen, full=False)
+
+    return run
+
+
+@scenario
+def hover(level, board):
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    board.draw(screen)
+    tracker = HoverTracker(board)
+    # The mouse mostly stays still or moves within a tile.
+    positions = [(x, 300) for x in range(100, 1100, 100) for _ in range(10)]
+
+    def run():
+        for position in positions:
+            tracker.update(position)
+            board.draw(screen, full=False)
+
+    return run
+
+
+@scenario
+def get_element(level, board):
+    positions = random_positions(board, 1000)
+
+    def run():
+        for position in positions:
+            board.get_element(*position)
+
+    return run
+
+
+@scenario
+def pick(level, board):
+    rng = random.Random(0)
+    points = [(rng.randrange(board.rect.width),
+               rng.randrange(board.rect.height))
+              for _ in range(1000)]
+
+    def run():
+        for point in points:
+            board.pick(point)
+
+    return run
+
+
+@scenario
+def compute_area_6_steps(level, board):
+    positions = random_positions(board, 20)
+
+    def run():
+        for position in positions:
+            compute_area(board, *position, 6)
+
+    return run
+
+
+@scenario
+def threats_6_steps(level, board):
+    chars = []
+    for position in dict.fromkeys(random_positions(board, 4)):
+        chars.append(Char(0, 0, 0, (212, 23, 132)))
+        board.place_char(chars[-1], *position)
+    return lambda: compute_threats(board, chars, 6)
+
+
+def measure(func, repeat, min_time=0.2):
+    """
+    Time func, calling it enough times per repeat to last min_time.
+
+    Return best and mean seconds per call.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    times = [elapsed / number for elapsed in timer.repeat(repeat, number)]
+    return number, min(times), sum(times) / len(times)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, scenarios, repeat, flyweight=False):
+    results = []
+    for size in sizes:
+        level = generate_level(*SIZES[size])
+        for name in scenarios:
+            board = get_board(level, flyweight=flyweight)
+            number, best, mean = measure(
+                SCENARIOS[name](level, board), repeat)
+            results.append({
+                'scenario': name,
+                'size': size,
+                'tiles': len(board.group),
+                'flyweight': flyweight,
+                'number': number,
+                'repeat': repeat,
+                'best': best,
+                'mean': mean,
+            })
+            print(f'{size:>8} {name:<22} {best * 1e3:10.3f} ms',
+                  file=sys.stderr)
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline):
+    """
+    Print the ratio of each best time to the baseline one.
+    """
+    previous = {(result['scenario'], result['size']): result['best']
+                for result in baseline['results']}
+    for result in report['results']:
+        key = (result['scenario'], result['size'])
+        if key in previous:
+            print(f'{result["size"]:>8} {result["scenario"]:<22} '
+                  f'x{result["best"] / previous[key]:.2f}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', nargs='+', choices=SIZES,
+                        default=['small', 'medium'])
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS,
+                        default=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='JSON file to write results to, '
+                                         'stdout by default')
+    parser.add_argument('--compare', help='JSON file of a previous run')
+    parser.add_argument('--flyweight', action='store_true',
+                        help='build boards of flyweight boxes')
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.scenarios, args.repeat, args.flyweight)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(report, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,19 @@
-from collections.abc import MutableMapping
-from dataclasses import dataclass
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from textwrap import dedent
 
 import pygame
 
-from .board import INDEX, Board, BoardBox, Char, CharSelected, ItemSelected, Event, KeyEvent
-from .algo import compute_path
+from .ai import Planner
+from .board import (Board, BoardBox, Char, FlyweightBox, HoverTracker,
+                    Prerenderer)
+from .events import ActionPlanned, CharSelected, Event, ItemSelected, KeyEvent
+from .level import Level
+from .line_of_sight import LineOfSight
+from .model import TILE_WALLS, StateLog
+from .profiler import PROFILER, Hud
+from .states import StateContext, ViewState
+from .threat import compute_threats
 
 
 SCREEN_WIDTH = 1200
@@ -14,57 +22,48 @@ BOARD_WIDTH = SCREEN_WIDTH
 BOARD_HEIGHT = SCREEN_HEIGHT
 BOARD_SIZE = (BOARD_WIDTH, BOARD_HEIGHT)
 FPS = 30
-
-
-pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-
-background = pygame.Surface(BOARD_SIZE)
-background.fill((255, 255, 255))  # fill white
-
-MAINLOOP = True
-
-
-def get_board():
-
-    def ground_without_wall(x, y, z):
-        box = BoardBox(x, y, z, (23, 76, 96))
-        box.update()
-        return box
-
-    def ground_with_x_wall(x, y, z):
-        box = BoardBox(x, y, z, (23, 76, 96))
-        box.wall_nw = True
-        box.update()
-        return box
-
-    def ground_with_y_wall(x, y, z):
-        box = BoardBox(x, y, z, (23, 76, 96))
-        box.wall_ne = True
-        box.update()
-        return box
-
-    def ground_with_xy_wall(x, y, z):
-        box = BoardBox(x, y, z, (23, 76, 96))
-        box.wall_nw = True
-        box.wall_ne = True
-        box.update()
-        return box
-
-    translate_map = {
-        'b': ground_with_xy_wall,
-        'x': ground_with_x_wall,
-        'y': ground_with_y_wall,
-        'w': ground_without_wall,
-    }
-
-    level = dedent("""
-    yxbw
-    wwyw
-    wxxw
-    wwww
-    wwww
-    """)
+# Update only the changed rects of the screen, the whole screen is
+# repainted only when the camera scrolls or the board rotates.
+DIRTY_RECTS = True
+# Seconds per frame spent rendering tile images in progressive startup.
+PRERENDER_BUDGET = 0.008
+
+LEVEL = dedent("""
+yxbw
+wwyw
+wxxw
+wwww
+wwww
+""")
+
+
+def get_board(level=LEVEL, cache_dir=None, flyweight=False, lazy=False):
+    """
+    :param cache_dir: directory of compiled levels, the level text is
+                      parsed on each call when it is None.
+    :param flyweight: build boxes as `FlyweightBox`, for large levels.
+    :param lazy: leave the tile images blank, to be rendered later by a
+                 `pg_iso.board.Prerenderer`.
+    """
+    box_class = FlyweightBox if flyweight else BoardBox
+
+    def box_builder(walls):
+
+        def build(x, y, z):
+            box = box_class(x, y, z, (23, 76, 96))
+            for wall in walls:
+                setattr(box, wall, True)
+            if not lazy:
+                box.update()
+            return box
+
+        return build
+
+    translate_map = {type_: box_builder(walls)
+                     for type_, walls in TILE_WALLS.items()}
+
+    if cache_dir is not None:
+        level = Level.load_cached(level, cache_dir)
 
     return Board(
         level,
@@ -72,276 +71,198 @@ def get_board():
     )
 
 
-board = get_board()
-board.place_char(
-    Char(0, 0, 0, (212, 23, 132)),
-    0, 0, 0
-)
-
-
-board.place_char(
-    Char(0, 0, 0, (124, 12, 90)),
-    1, 2, 0
-)
-
-
-def compute_area(x, y, z, nb_steps, out=None):
-    if out is None:
-        out = []
-
-    if not nb_steps:
-        return out
-
-    item = board.get_element(x, y, z)
-    next_item = board.get_element(x + 1, y, z)
-    if next_item is not None and \
-            next_item.char is None and \
-            next_item.wall_sw is None and \
-            item.wall_ne is None:
-        out.append(next_item)
-        compute_area(x + 1, y, z, nb_steps - 1, out)
-
-    next_item = board.get_element(x - 1, y, z)
-    if next_item is not None and \
-            next_item.char is None and \
-            next_item.wall_ne is None and \
-            item.wall_sw is None:
-        out.append(next_item)
-        compute_area(x - 1, y, z, nb_steps - 1, out)
-
-    next_item = board.get_element(x, y + 1, z)
-    if next_item is not None and \
-            next_item.char is None and \
-            next_item.wall_nw is None and \
-            item.wall_se is None:
-        out.append(next_item)
-        compute_area(x, y + 1, z, nb_steps - 1, out)
-
-    next_item = board.get_element(x, y - 1, z)
-    if next_item is not None and \
-            next_item.char is None and \
-            next_item.wall_se is None and \
-            item.wall_nw is None:
-        out.append(next_item)
-        compute_area(x, y - 1, z, nb_steps - 1, out)
-
-    return out
-
-
-class StateContext(MutableMapping):
-
-    def __init__(self, first_state_cls):
-        self._state = first_state_cls(self)
-        self._data = {}
-
-    def switch_state(self, state_cls):
-        self._state = state_cls(self)
-
-    def on_item_selected(self, event: ItemSelected):
-        self._state.on_item_selected(event)
-
-    def on_char_selected(self, event: CharSelected):
-        self._state.on_char_selected(event)
-
-    def on_key_pressed(self, event: KeyEvent):
-        self._state.on_attack_selected(event)
-
-    def __getitem__(self, item):
-        return self._data[item]
-
-    def __setitem__(self, key, value):
-        self._data[key] = value
-
-    def __delitem__(self, key):
-        del self._data[key]
-
-    def __iter__(self):
-        return iter(self._data)
-
-    def __len__(self):
-        return len(self._data)
-
-
-class State:
-
-    def __init__(self, ctx):
-        self.ctx = ctx
-
-    def on_item_selected(self, event: ItemSelected):
-        pass
-
-    def on_char_selected(self, event: CharSelected):
-        pass
-
-    def on_attack_selected(self, event: 'AttackEvent'):
-        pass
-
-
-class ViewState(State):
-
-    def on_char_selected(self, event: CharSelected):
-        for box in list(INDEX.highlighted):
-            box.unhighlight()
-
-        for box in compute_area(event.char.x,
-                                event.char.y,
-                                event.char.z, 2):
-            box.highlight()
-
-        self.ctx['char_to_move'] = event.char
-        self.ctx.switch_state(MoveState)
-
-    def on_item_selected(self, event: ItemSelected):
-        for box in list(INDEX.highlighted):
-            box.unhighlight()
-        self.ctx.switch_state(ViewState)
-
-    def on_attack_selected(self, event):
-        self.ctx.switch_state(ViewState)
-
-
-class MoveState(State):
-
-    def on_char_selected(self, event: CharSelected):
-        for box in list(INDEX.highlighted):
-            box.unhighlight()
-
-        for box in compute_area(event.char.x,
-                                event.char.y,
-                                event.char.z, 2):
-            box.highlight()
-
-        self.ctx['char_to_move'] = event.char
-        self.ctx.switch_state(MoveState)
-
-    def on_item_selected(self, event: ItemSelected):
-        char_to_move = self.ctx['char_to_move']
-        box = event.board.get_element(
-             char_to_move.x,
-             char_to_move.y,
-             char_to_move.z)
-
-        if event.item in INDEX.highlighted:
-            box.char = None
-            box.update()
-
-            event.board.place_char(
-                char_to_move,
-                event.item.x,
-                event.item.y,
-                event.item.z)
-
-        for box in list(INDEX.highlighted):
-            box.unhighlight()
-
-        self.ctx.switch_state(ViewState)
-
-    def on_attack_selected(self, event):
-        for box in list(INDEX.highlighted):
-            box.unhighlight()
-        self.ctx.switch_state(AttackState)
-
-
-class AttackState(State):
-
-    def on_char_selected(self, event: CharSelected):
-        for box in list(INDEX.highlighted):
-            box.unhighlight()
-
-        for pos in compute_path(
-                self.ctx['char_to_move'].x,
-                self.ctx['char_to_move'].y,
-                event.char.x,
-                event.char.y):
-            box = event.board.get_element(*pos, event.char.z)
-            if box is None:
-                box.highlight()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='pg_iso')
+    parser.add_argument('--hud', action='store_true',
+                        help='show the frame profiler overlay, '
+                             'toggled with F3')
+    parser.add_argument('--level-cache', metavar='DIR',
+                        help='load the level compiled in DIR, compiling '
+                             'it on the first start')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write each frame profile as a JSON line '
+                             'to FILE')
+    parser.add_argument('--flyweight', action='store_true',
+                        help='share tile images between boxes to reduce '
+                             'memory')
+    parser.add_argument('--progressive', action='store_true',
+                        help='show the first frame before the board is '
+                             'built, and render the tiles near the view '
+                             'first')
+    parser.add_argument('--ai-workers', metavar='N', type=int,
+                        help='processes planning the AI moves, one per CPU '
+                             'by default, 0 plans in the game process')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    background = pygame.Surface(BOARD_SIZE)
+    background.fill((255, 255, 255))  # fill white
+
+    prerenderer = None
+    if args.progressive:
+        screen.blit(background, (0, 0))
+        pygame.display.flip()
+        PROFILER.milestone('first_frame')
+        # Build the board in the background while the window stays
+        # responsive.
+        with ThreadPoolExecutor(1) as executor:
+            future = executor.submit(
+                get_board, cache_dir=args.level_cache,
+                flyweight=args.flyweight, lazy=True)
+            while not future.done():
+                pygame.event.pump()
+                pygame.time.wait(10)
+            board = future.result()
+        prerenderer = Prerenderer(
+            board, pygame.Rect(-board.rect.x, -board.rect.y, *BOARD_SIZE))
+    else:
+        board = get_board(cache_dir=args.level_cache,
+                          flyweight=args.flyweight)
+    PROFILER.milestone('board_ready')
+    chars = [Char(0, 0, 0, (212, 23, 132)), Char(0, 0, 0, (124, 12, 90))]
+    board.place_char(
+        chars[0],
+        0, 0, 0
+    )
 
-        self.ctx.switch_state(AttackState)
+    board.place_char(
+        chars[1],
+        1, 2, 0
+    )
 
-    def on_item_selected(self, event: ItemSelected):
-        for box in list(INDEX.highlighted):
-            box.unhighlight()
-        for pos in compute_path(
-                self.ctx['char_to_move'].x,
-                self.ctx['char_to_move'].y,
-                event.item.x,
-                event.item.y):
-            box = event.board.get_element(pos[0], pos[1], self.ctx['char_to_move'].z)
-            if box is not None:
-                box.highlight()
-
-        self.ctx.switch_state(AttackState)
-
-    def on_attack_selected(self, event):
-        for box in list(INDEX.highlighted):
-            box.unhighlight()
-
-        char = self.ctx['char_to_move']
-        for box in compute_area(char.x,
-                                char.y,
-                                char.z, 2):
-            box.highlight()
-
-        self.ctx.switch_state(MoveState)
-
-
-
-STATE = StateContext(ViewState)
-Event.add_trigger(STATE.on_item_selected, ItemSelected)
-Event.add_trigger(STATE.on_char_selected, CharSelected)
-Event.add_trigger(STATE.on_key_pressed, KeyEvent)
-
-clock = pygame.time.Clock()
-
-
-while MAINLOOP:
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            MAINLOOP = False
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
-                MAINLOOP = False
-            elif event.key == pygame.K_r:
-                board.rotate()
-            elif event.key == pygame.K_a:
-                Event.emit(KeyEvent(board, 'a'))
-
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if event.button == 1:
-                item = board.get_element_from_screen_position(event.pos)
-                if item is not None:
-                    if item.char is not None:
-                        Event.emit(CharSelected(board, item))
-                    else:
-                        Event.emit(ItemSelected(board, item))
-
-    pressed = pygame.key.get_pressed()
-    if pressed[pygame.K_UP]:
-        board.rect.y += 10
-    elif pressed[pygame.K_DOWN]:
-        board.rect.y -= 10
-    if pressed[pygame.K_LEFT]:
-        board.rect.x += 10
-    elif pressed[pygame.K_RIGHT]:
-        board.rect.x -= 10
-
-    position = pygame.mouse.get_pos()
-    if position[0] < 40:
-        board.rect.x += 10
-    elif position[0] > SCREEN_WIDTH - 40:
-        board.rect.x -= 10
-    if position[1] < 40:
-        board.rect.y += 10
-    elif position[1] > SCREEN_HEIGHT - 40:
-        board.rect.y -= 10
-
-    board.get_element_from_screen_position(position)
-
-    screen.blit(background, (0, 0))
-    board.draw(screen)
-    # pygame.display.set_caption(f"[FPS]: {pygame.mouse.get_pos()} {clock.get_fps():.2f}")
-
-    clock.tick(FPS)
-    pygame.display.flip()  # flip the screen
+    log = StateLog(board)
+    state = StateContext(ViewState)
+    state['line_of_sight'] = LineOfSight(board)
+    Event.add_trigger(state.on_item_selected, ItemSelected)
+    Event.add_trigger(state.on_char_selected, CharSelected)
+    Event.add_trigger(state.on_key_pressed, KeyEvent)
+    Event.add_trigger(state.on_action_planned, ActionPlanned)
+    hover = HoverTracker(board)
+    planner = Planner(args.ai_workers)
+
+    hud = Hud(PROFILER)
+    hud.visible = args.hud
+    if args.trace:
+        PROFILER.open_trace(args.trace)
+
+    clock = pygame.time.Clock()
+    last_view = None
+    mainloop = True
+
+    while mainloop:
+
+        with PROFILER.phase('events'):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    mainloop = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        mainloop = False
+                    elif event.key == pygame.K_r:
+                        board.rotate()
+                    elif event.key == pygame.K_a:
+                        Event.emit(KeyEvent(board, 'a'))
+                    elif event.key == pygame.K_F3:
+                        hud.toggle()
+                    elif event.key == pygame.K_u and log.depth:
+                        # Undo the last move.
+                        board.set_highlighted(())
+                        log.pop()
+                        state.switch_state(ViewState)
+                    elif event.key == pygame.K_p and 'char_to_move' in state:
+                        # Let the AI move the selected char.
+                        char = state['char_to_move']
+                        planner.plan(board, char,
+                                     [other for other in chars
+                                      if other is not char])
+                    elif event.key == pygame.K_d:
+                        # Show the tiles the other chars can attack.
+                        char = state['char_to_move'] \
+                            if 'char_to_move' in state else None
+                        threats = compute_threats(
+                            board, [other for other in chars
+                                    if other is not char])
+                        board.set_highlighted(threats.tiles(board))
+
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    if event.button == 1:
+                        item = board.get_element_from_screen_position(
+                            event.pos)
+                        if item is not None:
+                            if item.char is not None:
+                                Event.emit(CharSelected(board, item))
+                            else:
+                                Event.emit(ItemSelected(board, item))
+
+            planner.poll()
+
+        pressed = pygame.key.get_pressed()
+        if pressed[pygame.K_UP]:
+            board.rect.y += 10
+        elif pressed[pygame.K_DOWN]:
+            board.rect.y -= 10
+        if pressed[pygame.K_LEFT]:
+            board.rect.x += 10
+        elif pressed[pygame.K_RIGHT]:
+            board.rect.x -= 10
+
+        position = pygame.mouse.get_pos()
+        if position[0] < 40:
+            board.rect.x += 10
+        elif position[0] > SCREEN_WIDTH - 40:
+            board.rect.x -= 10
+        if position[1] < 40:
+            board.rect.y += 10
+        elif position[1] > SCREEN_HEIGHT - 40:
+            board.rect.y -= 10
+
+        with PROFILER.phase('hover'):
+            hover.update(position)
+
+        if prerenderer:
+            with PROFILER.phase('prerender'):
+                prerenderer.step(PRERENDER_BUDGET)
+            if not prerenderer:
+                PROFILER.milestone('prerendered')
+
+        with PROFILER.phase('draw'):
+            view = (board.rect.topleft, board.orientation, hud.visible)
+            if not DIRTY_RECTS or view != last_view:
+                screen.blit(background, (0, 0))
+                board.draw(screen)
+                rects = None
+                last_view = view
+            else:
+                rects = board.draw(screen, full=False)
+
+            if hud.visible:
+                hud_rect = hud.draw(screen, clock.get_fps())
+                if rects is not None:
+                    rects.append(hud_rect)
+
+        with PROFILER.phase('tick'):
+            clock.tick(FPS)
+
+        with PROFILER.phase('display'):
+            if rects is None:
+                pygame.display.flip()  # flip the screen
+            else:
+                pygame.display.update(rects)
+        # Only the board frame in progressive startup.
+        PROFILER.milestone('first_frame')
+        PROFILER.milestone('first_board_frame')
+
+        PROFILER.end_frame()
+
+    planner.shutdown()
+    PROFILER.close_trace()
+
+
+if __name__ == '__main__':
+    main()
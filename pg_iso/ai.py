@@ -0,0 +1,197 @@
+"""
+Turn planner of computer controlled chars.
+
+The board is copied to a compact `Snapshot`, the candidate moves are
+scored in worker processes and the chosen `Action` is emitted as an
+`ActionPlanned` event from `Planner.poll`, called by the game loop.
+"""
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from .algo import line_offsets
+from .events import ActionPlanned, Event
+from .line_of_sight import LineOfSight
+from .model import WALL_BITS, Character, Grid, Tile
+from .reachability import compute_reachable
+
+Position = Tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    Picklable copy of the tiles and chars of a grid.
+
+    tiles are (x, y, z, wall mask) tuples, chars are (x, y, z) tuples.
+    """
+
+    tiles: Tuple[Tuple[int, int, int, int], ...]
+    chars: Tuple[Position, ...]
+
+    @classmethod
+    def from_grid(cls, grid: Grid) -> 'Snapshot':
+        tiles = []
+        chars = []
+        for tile in grid:
+            mask = 0
+            for wall, bit in WALL_BITS:
+                if getattr(tile, wall):
+                    mask |= bit
+            tiles.append((tile.x, tile.y, tile.z, mask))
+            if tile.char is not None:
+                chars.append((tile.x, tile.y, tile.z))
+        return cls(tuple(tiles), tuple(chars))
+
+    def to_grid(self) -> Grid:
+        """
+        Build a display-free grid, chars are `Character`.
+        """
+        tiles = []
+        for x, y, z, mask in self.tiles:
+            tile = Tile(x, y, z)
+            for wall, bit in WALL_BITS:
+                if mask & bit:
+                    setattr(tile, wall, True)
+            tiles.append(tile)
+
+        grid = Grid(tiles)
+        for position in self.chars:
+            grid.place_char(Character(), *position)
+        return grid
+
+
+@dataclass(frozen=True)
+class Action:
+    """
+    Move of a char to move_to, attacking target if it is not None.
+
+    score is compared between candidates, the highest one is chosen.
+    """
+
+    move_to: Position
+    target: Optional[Position]
+    score: tuple
+
+
+def evaluate(snapshot: Snapshot, origin: Position,
+             targets: Tuple[Position, ...],
+             candidates: List[Tuple[Position, int]]) -> List[Action]:
+    """
+    Score each candidate (position, move cost) for the char at origin.
+
+    A candidate is better when more targets are visible from it, then
+    when the nearest target is closer, then when it costs less to reach.
+    """
+    grid = snapshot.to_grid()
+    # The moving char must not block its own lines.
+    grid.get_element(*origin).char = None
+    line_of_sight = LineOfSight(grid)
+
+    actions = []
+    for (x, y, z), cost in candidates:
+        visible = []
+        nearest = None
+        for target in targets:
+            distance = len(line_offsets(target[0] - x, target[1] - y))
+            if line_of_sight.compute(x, y, target[0], target[1], z,
+                                     target[2]):
+                visible.append((distance, target))
+            if nearest is None or distance < nearest:
+                nearest = distance
+
+        score = (len(visible),
+                 -nearest if nearest is not None else float('-inf'),
+                 -cost)
+        target = min(visible)[1] if visible else None
+        actions.append(Action((x, y, z), target, score))
+    return actions
+
+
+def choose(actions: List[Action]) -> Action:
+    """
+    Get the best action, the first one among equal scores.
+    """
+    best = None
+    for action in actions:
+        if best is None or action.score > best.score:
+            best = action
+    return best
+
+
+class Planner:
+    """
+    Plan the actions of chars in a process pool.
+
+    With workers=0, candidates are evaluated in the calling process when
+    planning, so results are deterministic and no process is started.
+    In both cases, actions are only delivered by `poll`.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self._executor = None
+        if self.workers:
+            self._executor = ProcessPoolExecutor(self.workers)
+        self._pending = []
+
+    def plan(self, grid: Grid, char, targets, nb_steps: int = 2) -> None:
+        """
+        Start planning the move of char, at most nb_steps away, to
+        attack one of targets.
+        """
+        version = grid.version
+        origin = (char.x, char.y, char.z)
+        reachable = compute_reachable(grid, *origin, nb_steps)
+        candidates = [(origin, 0)] + sorted(
+            ((box.x, box.y, box.z), reachable.distance[box])
+            for box in reachable)
+        snapshot = Snapshot.from_grid(grid)
+        positions = tuple((target.x, target.y, target.z)
+                          for target in targets)
+
+        if self._executor is None:
+            part = Future()
+            part.set_result(
+                evaluate(snapshot, origin, positions, candidates))
+            parts = [part]
+        else:
+            size = -(-len(candidates) // self.workers)
+            parts = [self._executor.submit(evaluate, snapshot, origin,
+                                           positions, candidates[i:i + size])
+                     for i in range(0, len(candidates), size)]
+        self._pending.append((grid, char, targets, nb_steps, version, parts))
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._pending)
+
+    def poll(self) -> None:
+        """
+        Emit an `ActionPlanned` event for each finished plan, plans made
+        on a board changed since are started again.
+        """
+        finished = []
+        pending = []
+        for plan in self._pending:
+            if all(part.done() for part in plan[-1]):
+                finished.append(plan)
+            else:
+                pending.append(plan)
+        # Triggers may start new plans.
+        self._pending = pending
+
+        for grid, char, targets, nb_steps, version, parts in finished:
+            actions = [action for part in parts for action in part.result()]
+            if grid.version != version:
+                # Chars moved or the board rotated while planning.
+                self.plan(grid, char, targets, nb_steps)
+                continue
+            Event.emit(ActionPlanned(grid, char, choose(actions)))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
@@ -1,37 +1,117 @@
-from math import floor
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 
+from .cache import LRUCache
 
-def compute_path(x1, y1, x2, y2):
+
+# Cells of lines relative to their origin, by delta, see `line_offsets`.
+LINE_CACHE = LRUCache(maxsize=4096)
+
+
+def compute_line(x1, y1, x2, y2):
+    """
+    Return the list of cells from x1, y1 (excluded) to x2, y2 (included).
+
+    Only integer arithmetic is used: the minor coordinate of the k-th cell
+    is the major step ratio rounded half up, that is
+    floor(k * minor / major + 0.5).
+    """
     dist_x = abs(x2 - x1)
     dist_y = abs(y2 - y1)
-    if dist_x == dist_y == 0:
-        return
+    step_x = 1 if x1 <= x2 else -1
+    step_y = 1 if y1 <= y2 else -1
+    cells = []
 
     if dist_x > dist_y:
-        if y1 <= y2:
-            step_y = dist_y / dist_x
-        else:
-            step_y = -dist_y / dist_x
-
-        if x1 <= x2:
-            x_values = range(x1 + 1, x2 + 1)
-        else:
-            x_values = range(x1 - 1, x2 - 1, -1)
-
-        for x in x_values:
-            y1 += step_y
-            yield x, floor(y1 + 0.5)
+        # Halves rounded up: a tie is a carry when going to +y only.
+        threshold = 2 * dist_x if y1 <= y2 else 2 * dist_x + 1
+        error = dist_x
+        y = y1
+        for x in range(x1 + step_x, x2 + step_x, step_x):
+            error += 2 * dist_y
+            if error >= threshold:
+                error -= 2 * dist_x
+                y += step_y
+            cells.append((x, y))
     else:
-        if x1 < x2:
-            step_x = dist_x / dist_y
-        else:
-            step_x = -dist_x / dist_y
-
-        if y1 <= y2:
-            y_values = range(y1 + 1, y2 + 1)
-        else:
-            y_values = range(y1 - 1, y2 - 1, -1)
-
-        for y in y_values:
-            x1 += step_x
-            yield floor(x1 + 0.5), y
+        threshold = 2 * dist_y if x1 <= x2 else 2 * dist_y + 1
+        error = dist_y
+        x = x1
+        for y in range(y1 + step_y, y2 + step_y, step_y):
+            error += 2 * dist_x
+            if error >= threshold:
+                error -= 2 * dist_y
+                x += step_x
+            cells.append((x, y))
+
+    return cells
+
+
+def line_offsets(dx, dy):
+    """
+    Return the offsets of the cells of the line from 0, 0 to dx, dy, as
+    a tuple.
+
+    Lines are the same from any origin, so they are cached by delta in
+    `LINE_CACHE`, whose info() gives the hit and miss counts.
+    """
+    return LINE_CACHE.get((dx, dy), lambda: tuple(compute_line(0, 0, dx, dy)))
+
+
+def compute_path(x1, y1, x2, y2):
+    """
+    Yield the cells of `compute_line`, translated from `line_offsets`.
+    """
+    for dx, dy in line_offsets(x2 - x1, y2 - y1):
+        yield x1 + dx, y1 + dy
+
+
+def compute_lines(x, y, targets):
+    """
+    Compute lines from one origin x, y to many targets at once.
+
+    :param targets: iterable of x, y pairs or NumPy array of shape (n, 2).
+
+    Return a list with one line per target, as returned by `compute_line`.
+    When targets is a NumPy array, every line is computed in one vectorized
+    pass and returned as an int array of shape (length, 2).
+    """
+    if np is None or not isinstance(targets, np.ndarray):
+        return [compute_line(x, y, target_x, target_y)
+                for target_x, target_y in targets]
+
+    targets = np.asarray(targets, dtype=np.int64).reshape(-1, 2)
+    if not len(targets):
+        return []
+
+    delta_x = targets[:, 0] - x
+    delta_y = targets[:, 1] - y
+    dist_x = np.abs(delta_x)
+    dist_y = np.abs(delta_y)
+    lengths = np.maximum(dist_x, dist_y)
+    ends = np.cumsum(lengths)
+
+    line = np.repeat(np.arange(len(targets)), lengths)
+    step = np.arange(1, ends[-1] + 1) - \
+        np.repeat(ends - lengths, lengths)
+
+    delta_x = delta_x[line]
+    delta_y = delta_y[line]
+    dist_x = dist_x[line]
+    dist_y = dist_y[line]
+    x_major = dist_x > dist_y
+
+    # The same floor(k * minor / major + 0.5) rounding as compute_line.
+    cells = np.empty((len(step), 2), dtype=np.int64)
+    cells[:, 0] = np.where(
+        x_major,
+        x + np.sign(delta_x) * step,
+        x + (2 * step * delta_x + dist_y) // np.maximum(2 * dist_y, 1))
+    cells[:, 1] = np.where(
+        x_major,
+        y + (2 * step * delta_y + dist_x) // np.maximum(2 * dist_x, 1),
+        y + np.sign(delta_y) * step)
+
+    return np.split(cells, ends[:-1])
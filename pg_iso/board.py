@@ -1,77 +1,336 @@
-from typing import Type
-
+import numpy as np
 import pygame
-from collections import defaultdict
-from dataclasses import dataclass
+from bisect import bisect_left, bisect_right
+from math import hypot
+from time import perf_counter
+
+from .cache import LRUCache
+from .events import (  # noqa: F401
+    BoardEvent, CharSelected, Event, ItemSelected, KeyEvent)
+from .level import Level
+from .model import Grid, TileRules, read_level
+from .profiler import PROFILER
+
+
+class _Layout:
+    """
+    Placement of the board items for one orientation: coordinates of
+    each item, coordinate index and drawing order.
+    """
+
+    def __init__(self, coords):
+        self.coords = coords
+        self.offset = max(y for _, y, _ in coords.values())
+        self.index = {coord: item for item, coord in coords.items()}
+        self.order = sorted(
+            coords, key=lambda item: BoardElement.depth(*coords[item]))
+        self._depths = [BoardElement.depth(*coords[item])
+                        for item in self.order]
+
+    def add(self, item, coord):
+        depth = BoardElement.depth(*coord)
+        i = bisect_right(self._depths, depth)
+        self._depths.insert(i, depth)
+        self.order.insert(i, item)
+        self.coords[item] = coord
+        self.index[coord] = item
+
+    def remove(self, item):
+        coord = self.coords.pop(item)
+        i = bisect_left(self._depths, BoardElement.depth(*coord))
+        while self.order[i] is not item:
+            i += 1
+        del self._depths[i]
+        del self.order[i]
+        if self.index.get(coord) is item:
+            del self.index[coord]
+
+
+class _Chunk:
+    """
+    Fixed-size part of the board image.
+
+    The surface is allocated when the chunk is drawn and freed when the
+    chunk is far from the screen.
+    """
 
+    def __init__(self, rect):
+        self.rect = rect
+        self.items = set()
+        self.surface = None
+        self.damaged = []
 
-class Board:
+    def damage(self, rect):
+        """
+        Mark the rect area, in board coordinates, to redraw.
+        """
+        if self.surface is not None:
+            self.damaged.append(rect.clip(self.rect))
 
-    @staticmethod
-    def read_level(level: str):
+    def render(self, color):
         """
-        Read level and return position of each cube
+        Redraw the damaged areas of the chunk, or the whole chunk if its
+        surface is not allocated.
         """
-        positions = []
-        z = 0
-        y = 0
-        for line in level.splitlines():
-            if not line:
-                z += 1
-                y = 0
-                continue
+        if self.surface is None:
+            self.surface = pygame.Surface(self.rect.size)
+            damaged = [self.rect]
+        elif len(self.damaged) > 8:
+            damaged = [self.damaged[0].unionall(self.damaged[1:])]
+        else:
+            damaged = self.damaged
+        self.damaged = []
+
+        items = sorted(self.items, key=lambda item: item.layer)
+        blitted = 0
+        for area in damaged:
+            local_area = area.move(-self.rect.x, -self.rect.y)
+            self.surface.set_clip(local_area)
+            self.surface.fill(color, local_area)
+            for item in items:
+                if item.rect.colliderect(area):
+                    self.surface.blit(
+                        item.image,
+                        (item.rect.x - self.rect.x,
+                         item.rect.y - self.rect.y))
+                    blitted += 1
+        self.surface.set_clip(None)
+        PROFILER.count('chunks_rendered')
+        PROFILER.count('sprites_blitted', blitted)
+        return damaged
+
+
+class Board(Grid):
+    """
+    Grid drawn with sprites.
 
-            for x, char in enumerate(line):
-                positions.append(([x, y, z], char))
-            y += 1
+    Items are built from the level by items_builder, the rules of the
+    model apply to them, see `pg_iso.model.Grid`.
+    """
 
-        for pos, _ in positions:
-            pos[2] = z - pos[2]
+    # Size in px of the square chunks of the board image.
+    chunk_size: int = 512
+    # Chunks farther than this distance in px from the screen are freed.
+    chunk_keep_distance: int = 512
+    color = (0, 255, 255)
 
-        return positions
+    read_level = staticmethod(read_level)
 
     def __init__(self, level, items_builder):
+        """
+        :param level: level text, see `read_level`, or compiled `Level`.
+        :param items_builder: mapping of tile characters to callables
+                              building the item at x, y, z.
+        """
+        super().__init__()
         self.items_builder = items_builder
         self.offset_y = 0
-        self.group = pygame.sprite.LayeredDirty()
         self.current_case = None
-        self.positions = self.read_level(level)
-        self.image = pygame.surface.Surface(self.compute_image_size())
-        self.image.fill((0, 255, 255))
-        self.bg = self.image.copy()
-        self.rect = self.image.get_rect()
+        self.orientation = 0
+        self._layouts = None
+        self._levels = set()
+        if not isinstance(level, Level):
+            level = Level.from_text(level)
+        self.level = level
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self._chunks = {}
+        self._item_chunks = {}
+        # Outline drawn over current_case.
+        self.cursor = Cursor()
         self._place_cubes()
-        self._reorder_before_drawing = False
+
+    @property
+    def group(self):
+        """
+        Items of the board in drawing order.
+        """
+        if self._layouts is None:
+            return []
+        return self._layouts[self.orientation].order
 
     def _place_cubes(self):
-        self.positions.sort(
-            key=lambda pos: (-pos[0][0], pos[0][1], pos[0][2]))
-        self.group.empty()
+        # Items are built at the level coordinates, so the board is back
+        # to the first orientation, with its bounds.
+        self.orientation = 0
+        self.rect.size = self.compute_image_size()
+        coords = self.level.coords
+        order = np.lexsort((coords[:, 2], coords[:, 1], -coords[:, 0]))
+        self._chunks.clear()
+        self._item_chunks.clear()
+        self._highlighted.clear()
+        self.current_case = None
+        self._levels = set(np.unique(coords[:, 2]).tolist())
 
-        for position, type_ in self.positions:
+        items = []
+        types = self.level.types[order].tobytes().decode('latin-1')
+        for position, type_ in zip(coords[order].tolist(), types):
             item = self.items_builder[type_](*position)
-            self.group.add(item)
+            item.place(*position, -self.offset_y)
+            self._add_to_chunks(item)
+            items.append(item)
+
+        self._build_layouts(items)
+        self.version += 1
+        if self.log is not None:
+            # Recorded tiles are not on the board anymore.
+            self.log.reset()
+
+    def _build_layouts(self, items=None):
+        """
+        Compute the layouts of the four orientations from the current one.
+
+        :param items: items to lay out, all items of the board by default.
+        """
+        if items is None:
+            items = self.group
+        coords = {item: (item.x, item.y, item.z) for item in items}
+        layouts = [None] * 4
+        for i in range(4):
+            layouts[(self.orientation + i) % 4] = _Layout(coords)
+            offset = max(y for _, y, _ in coords.values())
+            coords = {item: (offset - y, x, z)
+                      for item, (x, y, z) in coords.items()}
+
+        self._layouts = layouts
+        self._index = layouts[self.orientation].index
+        self._index_columns()
+        self.masks.rebuild(items)
+
+    def _add_to_layouts(self, item):
+        """
+        Insert item in the layouts of the four orientations.
 
-        for item in self.group:
-            item.rect.y -= self.offset_y
+        The coordinates in the other orientations are turned around a
+        reference item, as the layouts are turned from each other.
+        Layouts are rebuilt when the item is outside the board, as it
+        changes the rotation offsets.
+        """
+        group = self.group
+        if not group:
+            self._build_layouts([item])
+            self._update_orientation_rects()
+            return
+
+        reference = group[0]
+        coords = []
+        dx, dy = item.x - reference.x, item.y - reference.y
+        for i in range(4):
+            orientation = (self.orientation + i) % 4
+            layout = self._layouts[orientation]
+            x, y, _ = layout.coords[reference]
+            coord = (x + dx, y + dy, item.z)
+            if coord[1] > layout.offset:
+                self._build_layouts(group + [item])
+                self._update_orientation_rects()
+                return
+
+            coords.append((orientation, coord))
+            dx, dy = -dy, dx
+
+        for orientation, coord in coords:
+            self._layouts[orientation].add(item, coord)
+            self.orientation_rects[orientation].union_ip(
+                BoardElement.create_and_place_rect(*coord, -self.offset_y))
+
+    def _remove_from_layouts(self, item):
+        """
+        Remove item from the layouts of the four orientations.
+
+        Layouts are rebuilt when the item may bound the board, as it
+        changes the rotation offsets.
+        """
+        if any(layout.coords[item][1] == layout.offset
+               for layout in self._layouts):
+            self._build_layouts(
+                [other for other in self.group if other is not item])
+            self._update_orientation_rects()
+        else:
+            for layout in self._layouts:
+                layout.remove(item)
+
+    def _update_orientation_rects(self):
+        """
+        Compute the bounds of each orientation from the layouts.
+        """
+        for orientation, layout in enumerate(self._layouts):
+            rects = [BoardElement.create_and_place_rect(*coord,
+                                                        -self.offset_y)
+                     for coord in layout.coords.values()]
+            if rects:
+                rects[0].unionall_ip(rects[1:])
+                self.orientation_rects[orientation] = rects[0]
+            else:
+                self.orientation_rects[orientation] = pygame.Rect(0, 0, 0, 0)
+
+    def compute_orientation_bounds(self):
+        """
+        Get (left, top, right, bottom) px bounds of the items for each
+        orientation, without y correction.
+
+        The projection is linear, so the bounds only depend on the extreme
+        values of x + y, y - x and of the top px position of the items.
+        They are computed without rotating any coordinate: each rotation
+        swaps or negates x + y and y - x and adds constant offsets.
+        """
+        coords = self.level.coords.astype(np.int64)
+        x, y, z = coords[:, 0], coords[:, 1], coords[:, 2]
+        size = BoardBox.size
+        offset_x = BoardBox.offset_x
+        offset_bd = BoardBox.offset_y_bd
+        height_z = (size - BoardBox.offset_y_c) * z
+        max_x, max_y = int(x.max()), int(y.max())
+        min_x, min_y = int(x.min()), int(y.min())
+
+        def extent(values):
+            return int(values.min()), int(values.max())
+
+        sum_xy = extent(x + y)
+        diff_yx = extent(y - x)
+        top_sum = {1: extent(offset_bd * (x + y) - height_z),
+                   -1: extent(-offset_bd * (x + y) - height_z)}
+        top_diff = {1: extent(offset_bd * (y - x) - height_z),
+                    -1: extent(-offset_bd * (y - x) - height_z)}
+
+        def bounds(horizontal, horizontal_sign, horizontal_offset,
+                   vertical, vertical_sign, vertical_offset):
+            low, high = horizontal
+            if horizontal_sign < 0:
+                low, high = -high, -low
+            top, bottom = vertical[vertical_sign]
+            left = (low + horizontal_offset) * offset_x
+            right = (high + horizontal_offset) * offset_x + size
+            top += vertical_offset * offset_bd
+            bottom += vertical_offset * offset_bd + size
+            return left, top, right, bottom
+
+        # x + y and y - x of each orientation from the ones of the level:
+        # 0: x + y,             y - x
+        # 1: Y - (y - x),       (x + y) - Y
+        # 2: X + Y - (x + y),   Y - X - (y - x)
+        # 3: X - min_y + (y - x), X + min_y - (x + y)
+        return [
+            bounds(sum_xy, 1, 0, top_diff, 1, 0),
+            bounds(diff_yx, -1, max_y, top_sum, 1, -max_y),
+            bounds(sum_xy, -1, max_x + max_y, top_diff, -1, max_y - max_x),
+            bounds(diff_yx, 1, max_x - min_y, top_sum, -1, max_x + min_y),
+        ]
 
     def compute_image_size(self):
-        max_x = 0
-        max_y = 0
-        min_x = float('inf')
-        min_y = float('inf')
-        offset_y = float('inf')
-        for _ in range(4):
-            offset = max(pos[1] for pos, _ in self.positions)
-            for pos, type_ in self.positions:
-                pos[0], pos[1] = offset - pos[1], pos[0]
-                rect = BoardBox.create_and_place_rect(*pos)
-                max_x = max(max_x, rect.right)
-                max_y = max(max_y, rect.bottom)
-                min_x = min(min_x, rect.left)
-                min_y = min(min_y, rect.top)
-
-            offset_y = min(max_y - min_y, offset_y)
+        bounds = self.compute_orientation_bounds()
+        # The size covers the four rotations of the level, the last one is
+        # the level moved to x = 0 and y = 0.
+        min_x_level = int(self.level.coords[:, 0].min())
+        min_y_level = int(self.level.coords[:, 1].min())
+        left, top, right, bottom = bounds[0]
+        shift_x = -BoardBox.offset_x * (min_x_level + min_y_level)
+        shift_y = BoardBox.offset_y_bd * (min_x_level - min_y_level)
+        rotations = bounds[1:] + [(left + shift_x, top + shift_y,
+                                   right + shift_x, bottom + shift_y)]
+
+        max_x = max(0, max(right for _, _, right, _ in rotations))
+        max_y = max(0, max(bottom for _, _, _, bottom in rotations))
+        min_x = min(left for left, _, _, _ in rotations)
+        min_y = min(top for _, top, _, _ in rotations)
 
         if min_x < 0:
             max_x -= min_x
@@ -80,148 +339,308 @@ class Board:
             max_y -= min_y
 
         self.offset_y = min_y
+        self.orientation_rects = [
+            pygame.Rect(left, top - min_y, right - left, bottom - top)
+            for left, top, right, bottom in bounds]
         return max_x, max_y
 
-    def rotate(self):
-        """
-        Rotate the board.
+    def rotate(self, reverse: bool = False):
         """
-        items = list(self.group)
-
-        offset = max(item.y for item in items)
-        for item in items:
-            item.place(
-                offset - item.y,
-                item.x,
-                item.z,
-                # Center middle of board to y
-                -self.offset_y
-            )
+        Rotate the board, back to the previous orientation when reverse
+        is True.
 
-        items.sort(
-            key=lambda item: (-item.x, item.y, item.z))
-
-        self.group.empty()
-        for item in items:
-            item.rotate()
-            self.group.add(item)
-
-        self.image.fill((0, 255, 255))
-
-    def draw(self, surface):
-        if self._reorder_before_drawing:
-            items = list(self.group)
-            items.sort(key=lambda item: (-item.x, item.y, item.z))
-            self.group.empty()
-            for item in items:
-                self.group.add(item)
-            self._reorder_before_drawing = False
+        Items are placed and ordered from the precomputed layout of the
+        next orientation.
+        """
+        self.orientation = (self.orientation + (-1 if reverse else 1)) % 4
+        layout = self._layouts[self.orientation]
+        reference = layout.order[0] if layout.order else None
+        if reference is not None:
+            previous = (reference.x, reference.y)
+
+        self._chunks.clear()
+        self._item_chunks.clear()
+        for item in layout.order:
+            # Center middle of board to y
+            item.place(*layout.coords[item], -self.offset_y)
+            item.rotate(reverse)
+            self._add_to_chunks(item)
+            char = getattr(item, 'char', None)
+            if char is not None:
+                char.x, char.y, char.z = item.x, item.y, item.z
+
+        self._index = layout.index
+        self._index_columns()
+        if reference is not None:
+            self._rotate_masks(reference, previous, reverse)
+        self.move_cursor(self.current_case)
+        self.version += 1
+        if self.log is not None:
+            self.log.record_rotation(reverse)
+
+    def _chunk_keys(self, rect):
+        """
+        Get keys of chunks overlapped by rect.
+        """
+        size = self.chunk_size
+        return [(column, row)
+                for column in range(rect.left // size,
+                                    (rect.right - 1) // size + 1)
+                for row in range(rect.top // size,
+                                 (rect.bottom - 1) // size + 1)]
+
+    def _add_to_chunks(self, item):
+        keys = self._item_chunks[item] = self._chunk_keys(item.rect)
+        for key in keys:
+            chunk = self._chunks.get(key)
+            if chunk is None:
+                chunk = self._chunks[key] = _Chunk(pygame.Rect(
+                    key[0] * self.chunk_size, key[1] * self.chunk_size,
+                    self.chunk_size, self.chunk_size))
+            chunk.items.add(item)
+            chunk.damage(item.rect)
+
+    def _remove_from_chunks(self, item):
+        for key in self._item_chunks.pop(item):
+            chunk = self._chunks[key]
+            chunk.items.discard(item)
+            chunk.damage(item.rect)
+
+    def draw(self, surface, full=True):
+        """
+        Draw the chunks of the board visible on surface.
 
-        self.group.draw(self.image)
-        self.group.clear(self.image, self.bg)
-        surface.blit(self.image, self.rect.topleft)
+        Only the areas of dirty items are redrawn in the chunks. When full
+        is False, only those areas are blitted on surface. When it is True,
+        the board bounds are filled with the board color first, as chunks
+        only cover the areas of the items.
 
-    def get_element(self, x: int, y: int, z: int):
+        Return the list of changed rects on surface.
         """
-        Get element from position x, y and z
+        view = pygame.Rect(-self.rect.x, -self.rect.y, *surface.get_size())
+        items_view = view.clip(self.orientation_rects[self.orientation])
+        visible = [self._chunks[key] for key in self._chunk_keys(items_view)
+                   if key in self._chunks] if items_view else []
+
+        dirty_items = {item for chunk in visible
+                       for item in chunk.items if item.dirty}
+        for item in dirty_items:
+            for key in self._item_chunks[item]:
+                self._chunks[key].damage(item.rect)
+            if item.dirty == 1:
+                item.dirty = 0
+
+        # Chunks on the edges go past the board bounds.
+        bounds = pygame.Rect((0, 0), self.rect.size)
+        if full:
+            surface.fill(self.color, self.rect)
+
+        changed = []
+        for chunk in visible:
+            if chunk.surface is None or chunk.damaged:
+                damaged = chunk.render(self.color)
+            else:
+                damaged = []
+
+            if full:
+                area = chunk.rect.clip(bounds)
+                surface.blit(chunk.surface,
+                             area.move(self.rect.topleft),
+                             area.move(-chunk.rect.x, -chunk.rect.y))
+            else:
+                for area in damaged:
+                    area = area.clip(bounds)
+                    if not area:
+                        continue
+                    changed.append(area.move(self.rect.topleft))
+                    surface.blit(
+                        chunk.surface,
+                        changed[-1],
+                        area.move(-chunk.rect.x, -chunk.rect.y))
+
+        keep = view.inflate(2 * self.chunk_keep_distance,
+                            2 * self.chunk_keep_distance)
+        for chunk in self._chunks.values():
+            if chunk.surface is not None and \
+                    not chunk.rect.colliderect(keep):
+                chunk.surface = None
+                chunk.damaged = []
+
+        if full:
+            return [surface.get_rect()]
+        return changed
+
+    def pick(self, point):
+        """
+        Get the element drawn under the x, y screen position.
+
+        Candidate columns are found by inverting the isometric projection
+        for each z level of the board, so only a few elements are tested
+        whatever the size of the board.
 
-        Return None if element is not found.
+        Return None if no element is found.
         """
-        # TODO self.group is sorted, a more efficient way is possible.
-        for element in self.group:
-            if element.x == x and element.y == y and element.z == z:
-                return element
+        point = (point[0] - self.rect.x, point[1] - self.rect.y)
+        best = None
+        best_key = None
+        for z in self._levels:
+            for x, y in BoardElement.find_positions(
+                    *point, z, -self.offset_y):
+                case = self._index.get((x, y, z))
+                if case is None or not case.rect.collidepoint(point):
+                    continue
+
+                key = (hypot(case.center[0] - point[0],
+                             case.center[1] - point[1]),
+                       -x, y, z)
+                if best_key is None or key < best_key:
+                    best, best_key = case, key
+
+        return best
 
     def get_element_from_screen_position(self, point):
         """
         Get element from x, y screen  position.
         """
-        point = (point[0] - self.rect.x, point[1] - self.rect.y)
-        cases = []
-        for case in self.group:
-            if case.rect.collidepoint(point):
-                cases.append(case)
-
-        if cases:
-            dist_from_case = [
-                (pygame.math.Vector2(case.center).distance_to(point), i)
-                for i, case
-                in enumerate(cases)]
-
-            i = min(dist_from_case)[1]
-            cases[i].activate()
-            if self.current_case is not None and \
-                    self.current_case is not cases[i]:
-                self.current_case.deactivate()
-
-            self.current_case = cases[i]
-            return self.current_case
+        case = self.pick(point)
+        if case is not None:
+            if case is not self.current_case:
+                if self.current_case is not None:
+                    self.current_case.deactivate()
+                case.activate()
+                self.current_case = case
+                self.move_cursor(case)
+            return case
+
+    def move_cursor(self, item) -> None:
+        """
+        Draw the cursor over item, or hide it when item is None.
+        """
+        if self.cursor in self._item_chunks:
+            self._remove_from_chunks(self.cursor)
+        if item is not None:
+            self.cursor.place(item.x, item.y, item.z, -self.offset_y)
+            self._add_to_chunks(self.cursor)
 
     def place_item(self, item, x: int, y: int, z: int) -> None:
-        item.place(x, y, z, -self.offset_y)
-        self.group.add(item)
-        self._reorder_before_drawing = True
-
-    def place_char(self, char: 'Char', x: int, y: int, z: int) -> None:
-        char.x, char.y, char.z = x, y, z
-        item = self.get_element(x, y, z)
-        if not isinstance(item, BoardBox):
-            raise TypeError(f'{x} {y} {z} is not a box')
+        """
+        Place item at x, y, z, or move it there if it is already on the
+        board.
 
-        # TODO if char is already placed
-        item.char = char
-        item.update()
+        The item is inserted at its depth layer, the board is not
+        re-sorted.
+        """
+        if item in self._item_chunks:
+            self._remove_from_layouts(item)
+            self._remove_from_chunks(item)
+            self._remove_from_columns(item)
+            self.masks.remove(item)
+        item.place(x, y, z, -self.offset_y)
 
-    def move_char(self, char: 'Char', x: int, y: int, z: int) -> None:
-        item = self.get_element(char.x, char.y, char.z)
-        if item is not None:
-            item.char = None
-            item.update()
-        self.place_char(char, x, y, z)
+        self._levels.add(z)
+        self._add_to_layouts(item)
+        self._add_to_chunks(item)
+        self._add_to_columns(item)
+        self.masks.update(item)
+        if item is self.current_case:
+            self.move_cursor(item)
+        self.version += 1
 
+    def remove_item(self, item) -> None:
+        """
+        Remove item from the board.
+        """
+        self._remove_from_layouts(item)
+        self._remove_from_chunks(item)
+        self._remove_from_columns(item)
+        self.masks.remove(item)
+        if item is self.current_case:
+            self.current_case = None
+            self.move_cursor(None)
+        self._highlighted.discard(item)
+        self.version += 1
+
+
+class HoverTracker:
+    """
+    Keep the board element under the mouse up to date.
 
-class _Index:
+    The board is only picked again when the mouse position, the camera
+    offset or the orientation changed since the last call, see
+    `invalidate` for other changes of the board.
+    """
 
-    def __init__(self):
-        self.highlighted = set()
+    def __init__(self, board: Board):
+        self.board = board
+        self._last = None
 
+    def update(self, position):
+        """
+        Activate the element at the position on screen and return the
+        current one.
+        """
+        board = self.board
+        key = (tuple(position), board.rect.topleft, board.orientation)
+        if key != self._last:
+            self._last = key
+            PROFILER.count('picks')
+            board.get_element_from_screen_position(position)
+        return board.current_case
+
+    def invalidate(self):
+        """
+        Pick on the next update, after items are placed or removed.
+        """
+        self._last = None
 
-INDEX = _Index()
 
+class Prerenderer:
+    """
+    Update the images of board items a few at a time, the closest to the
+    view first.
 
-class BoardElement(pygame.sprite.DirtySprite):
+    Boards built with items not updated yet can be shown right away, their
+    tiles appear as they are rendered.
     """
-    A BoardElement is an element of the Board.
 
-    Each element has x, y, z coordinates. In the example bellow,
-    the board has 4 BoardElements with coordinates
+    def __init__(self, board: Board, view):
+        """
+        :param view: rect of the screen area, in board coordinates.
+        """
+        x, y = view.center
+        # Closest items last, as they are popped.
+        self._items = sorted(
+            board.group,
+            key=lambda item: -hypot(item.center[0] - x, item.center[1] - y))
 
-        z x
-        ↑↗
-         ↘
-          y
-             ╱╲
-            ╱E1╱╲        E1  (1, 0, 0)
-           ╱╲ ╱E2╲       E2  (1, 1, 1)
-          ╱E3╲╲  ╱       E3  (0, 0, 0)
-          ╲  ╱╲╲╱        E4  (0, 1, 0)
-           ╲╱E4╲
-            ╲  ╱
-             ╲╱
+    def __len__(self):
+        return len(self._items)
 
-    A BoardElement provides 7 points named a, b, c, d, e, f and g for easy
-    cube or boxes isometric drawing.
+    def step(self, budget: float) -> int:
+        """
+        Update items for budget seconds, at least one.
 
-           a
-          ╱│╲
-        d╱ │ ╲ b
-        │ ╱c╲ │
-        │╱   ╲│
-       g ╲   ╱ e
-          ╲ ╱
-           f
+        Return the number of updated items.
+        """
+        deadline = perf_counter() + budget
+        updated = 0
+        while self._items:
+            self._items.pop().update()
+            updated += 1
+            if perf_counter() >= deadline:
+                break
+        PROFILER.count('prerendered', updated)
+        return updated
+
+
+class _ElementBase:
+    """
+    Geometry and behaviour shared by `BoardElement` and
+    `FlyweightElement`.
     """
 
+    __slots__ = ()
+
     size: int = 120
     rate: float = 0.5
     offset_x: int = int(size / 2)
@@ -239,20 +658,28 @@ class BoardElement(pygame.sprite.DirtySprite):
 
     key_color = (0, 0, 0)
 
-    def __init__(self, x, y, z, color):
-        super().__init__()
-        self.x = x
-        self.y = y
-        self.z = z
-        self._orientation = 'sn'
-        self.cursor = None
-        self.image = pygame.Surface((self.size, self.size))
-        self.image.fill(self.key_color)
-        self.image.set_colorkey(self.key_color)
-        self.color = color
-        self.rect = self.create_and_place_rect(x, y, z)
+    # Orientations in the order the board rotates.
+    orientations = ('ns', 'we', 'sn', 'ew')
 
-        self.center = (self.rect.x + self.offset_x, self.rect.bottom)
+    # Coordinates must be in ]-depth_span / 2, depth_span / 2[
+    depth_span: int = 1 << 16
+
+    # Images shared by elements, such as the blank image or char images.
+    image_cache = LRUCache(maxsize=64)
+
+    @classmethod
+    def blank_image(cls):
+        """
+        Get the transparent image shared by elements not drawn yet.
+        """
+        return cls.image_cache.get(('blank', cls.size), cls.new_image)
+
+    @classmethod
+    def new_image(cls):
+        image = pygame.Surface((cls.size, cls.size))
+        image.fill(cls.key_color)
+        image.set_colorkey(cls.key_color)
+        return image
 
     @property
     def orientation(self):
@@ -279,38 +706,158 @@ class BoardElement(pygame.sprite.DirtySprite):
             cls.size,
             cls.size)
 
+    @classmethod
+    def find_positions(cls, px, py, z, y_px=0):
+        """
+        Inverse of `create_and_place_rect`.
+
+        Yield the x, y board positions at level z whose rect contains
+        the px, py point.
+
+        :param px: x px position on the board image
+        :param py: y px position on the board image
+        :param z: board z
+        :param y_px: px correction
+        """
+        py += z * (cls.size - cls.offset_y_c) - y_px
+        for sum_xy in range((px - cls.size) // cls.offset_x + 1,
+                            px // cls.offset_x + 1):
+            for diff_yx in range((py - cls.size) // cls.offset_y_bd + 1,
+                                 py // cls.offset_y_bd + 1):
+                if (sum_xy - diff_yx) % 2 == 0:
+                    yield (sum_xy - diff_yx) // 2, (sum_xy + diff_yx) // 2
+
+    @classmethod
+    def depth(cls, x, y, z):
+        """
+        Get the drawing layer of the x, y, z position.
+
+        Layers are sorted as (-x, y, z), elements behind are drawn first.
+        """
+        return (-x * cls.depth_span + y) * cls.depth_span + z
+
+    def activate(self):
+        pass
+
+    def deactivate(self):
+        pass
+
+    def rotate(self, reverse: bool = False):
+        orientations = self.orientations
+        self._orientation = orientations[
+            (orientations.index(self._orientation) +
+             (-1 if reverse else 1)) % 4]
+
+    def update(self):
+        pass
+
+
+class BoardElement(_ElementBase, pygame.sprite.DirtySprite):
+    """
+    A BoardElement is an element of the Board.
+
+    Each element has x, y, z coordinates. In the example bellow,
+    the board has 4 BoardElements with coordinates
+
+        z x
+        ↑↗
+         ↘
+          y
+             ╱╲
+            ╱E1╱╲        E1  (1, 0, 0)
+           ╱╲ ╱E2╲       E2  (1, 1, 1)
+          ╱E3╲╲  ╱       E3  (0, 0, 0)
+          ╲  ╱╲╲╱        E4  (0, 1, 0)
+           ╲╱E4╲
+            ╲  ╱
+             ╲╱
+
+    A BoardElement provides 7 points named a, b, c, d, e, f and g for easy
+    cube or boxes isometric drawing.
+
+           a
+          ╱│╲
+        d╱ │ ╲ b
+        │ ╱c╲ │
+        │╱   ╲│
+       g ╲   ╱ e
+          ╲ ╱
+           f
+
+    The image of an element not drawn yet is shared, see `blank_image`.
+    """
+
+    def __init__(self, x, y, z, color):
+        super().__init__()
+        self.x = x
+        self.y = y
+        self.z = z
+        self._layer = self.depth(x, y, z)
+        self._orientation = 'sn'
+        self.cursor = None
+        self.image = self.blank_image()
+        self.color = color
+        self.rect = self.create_and_place_rect(x, y, z)
+
+        self.center = (self.rect.x + self.offset_x, self.rect.bottom)
+
     def place(self, x, y, z, y_px=0):
         self.x = x
         self.y = y
         self.z = z
+        self._layer = self.depth(x, y, z)
         self.rect = self.create_and_place_rect(self.x, self.y, self.z, y_px)
         self.center = (self.rect.x + self.offset_x, self.rect.bottom)
         self.dirty = 1
 
-    def activate(self):
-        pass
 
-    def deactivate(self):
-        pass
+class FlyweightElement(_ElementBase):
+    """
+    BoardElement keeping only its coordinates, orientation and state.
 
-    def rotate(self):
-        current_orientation = self._orientation
-        if current_orientation == 'ns':
-            self._orientation = 'we'
-        elif current_orientation == 'we':
-            self._orientation = 'sn'
-        elif current_orientation == 'sn':
-            self._orientation = 'ew'
-        else:
-            self._orientation = 'ns'
+    It is not a sprite: its rect is computed when accessed and its image is
+    shared with the elements drawn the same, so a board can hold far more
+    elements than with `BoardElement`.
+    """
 
-    def update(self):
-        pass
+    __slots__ = ('x', 'y', 'z', '_orientation', '_y_px',
+                 'cursor', 'color', 'image', 'dirty')
+
+    def __init__(self, x, y, z, color):
+        self.x = x
+        self.y = y
+        self.z = z
+        self._orientation = 'sn'
+        self._y_px = 0
+        self.cursor = None
+        self.color = color
+        self.image = self.blank_image()
+        self.dirty = 1
+
+    @property
+    def rect(self):
+        return self.create_and_place_rect(self.x, self.y, self.z, self._y_px)
+
+    @property
+    def center(self):
+        rect = self.rect
+        return rect.x + self.offset_x, rect.bottom
+
+    @property
+    def layer(self):
+        return self.depth(self.x, self.y, self.z)
+
+    def place(self, x, y, z, y_px=0):
+        self.x = x
+        self.y = y
+        self.z = z
+        self._y_px = y_px
+        self.dirty = 1
 
 
-class BoardBox(BoardElement):
+class _BoxBase(TileRules, _ElementBase):
     """
-    This BoardElement can contain a char and can have walls.
+    Walls, char and drawing of `BoardBox` and `FlyweightBox`.
 
 
      In the example bellow, 4 BoardBox with respectively wall ne, nw,
@@ -326,15 +873,10 @@ class BoardBox(BoardElement):
            f            f          f           f
     """
 
-    def __init__(self, x, y, z, color):
-        super().__init__(x, y, z, color)
+    __slots__ = ()
 
-        self.wall_nw = None
-        self.wall_ne = None
-        self.wall_sw = None
-        self.wall_se = None
-        self.char = None
-        self.highlighted = False
+    # Rendered images shared by boxes in the same visual state.
+    tile_cache = LRUCache(maxsize=512)
 
     def draw_ground(self):
         pygame.draw.polygon(
@@ -382,38 +924,43 @@ class BoardBox(BoardElement):
         self.image.blit(self.char.image, (0, 0))
 
     def activate(self):
+        # The outline is drawn by the board cursor, see `Cursor`.
         self.cursor = True
-        self.update()
 
     def deactivate(self):
         self.cursor = None
-        self.update()
 
-    def highlight(self):
-        self.highlighted = True
-        INDEX.highlighted.add(self)
+    def rotate(self, reverse: bool = False):
+        super().rotate(reverse)
+        self.rotate_walls(reverse)
         self.update()
 
-    def unhighlight(self):
-        self.highlighted = False
-        INDEX.highlighted.remove(self)
-        self.update()
-
-    def rotate(self):
-        super().rotate()
-        self.wall_nw, self.wall_ne, self.wall_se, self.wall_sw = \
-            self.wall_sw, self.wall_nw, self.wall_ne, self.wall_se
-        self.update()
+    def state_key(self):
+        """
+        Key of the visual state of the box, boxes with the same key are
+        drawn the same.
+        """
+        return (type(self), tuple(self.color),
+                self.wall_ne, self.wall_nw, self.wall_se, self.wall_sw,
+                self.highlighted, self.char)
 
     def update(self):
+        self.image = self.tile_cache.get(self.state_key(), self.render)
+        self.dirty = 1
+        PROFILER.count('tiles_updated')
+
+    def render(self):
+        """
+        Draw the box on a new image and return it.
+        """
         # # DEBUG
         # pygame.draw.polygon(
         #      self.image,
         #      (240, 30, 30),
         #      ((2, 2), (self.size-2, 2), (self.size-2, self.size-2), (2, self.size-2)),
         #      1)
-        self.image.fill((0, 2, 3))
-        self.image.fill(self.key_color)
+        PROFILER.count('tiles_redrawn')
+        self.image = self.new_image()
 
         if self.wall_ne:
             self.draw_wall_ne()
@@ -428,96 +975,100 @@ class BoardBox(BoardElement):
                 (self.g, self.c, self.e, self.f)
             )
 
-        if self.cursor:
-            pygame.draw.polygon(
-                self.image,
-                (30, 100, 230),
-                (self.g, self.d, self.d, self.a, self.c),
-                2
-            )
-
-            pygame.draw.polygon(
-                self.image,
-                (30, 100, 230),
-                (self.a, self.b, self.e, self.c),
-                2
-            )
-
         if self.char:
             self.draw_char()
 
-        if self.cursor:
-            pygame.draw.polygon(
-                self.image,
-                (30, 100, 230),
-                (self.d, self.c, self.f, self.g),
-                2
-            )
-
-            pygame.draw.polygon(
-                self.image,
-                (30, 100, 230),
-                (self.c, self.b, self.e, self.f),
-                2
-            )
-
         if self.wall_se:
             self.draw_wall_se()
         if self.wall_sw:
             self.draw_wall_sw()
-        self.dirty = 1
+        return self.image
 
 
-class Char(BoardElement):
+class BoardBox(_BoxBase, BoardElement):
+    """
+    This BoardElement can contain a char and can have walls.
+
+    See `_BoxBase` for drawing.
+    """
 
     def __init__(self, x, y, z, color):
         super().__init__(x, y, z, color)
-        pygame.draw.polygon(
-            self.image,
-            self.color,
-            ((self.size / 4, 10),
-             (self.size / 4 * 3, 10),
-             (self.size / 4 * 3, self.size - 30),
-             (self.size / 4, self.size - 30))
-        )
-
 
-@dataclass
-class BoardEvent:
-    board: Board
+        self.wall_nw = None
+        self.wall_ne = None
+        self.wall_sw = None
+        self.wall_se = None
+        self.char = None
+        self.highlighted = False
 
 
-@dataclass
-class KeyEvent:
-    board: Board
-    key: str
+class FlyweightBox(_BoxBase, FlyweightElement):
+    """
+    BoardBox as a `FlyweightElement`.
+    """
 
+    __slots__ = ('wall_nw', 'wall_ne', 'wall_sw', 'wall_se',
+                 'char', 'highlighted')
 
-@dataclass
-class ItemSelected(BoardEvent):
-    item: BoardElement
+    def __init__(self, x, y, z, color):
+        super().__init__(x, y, z, color)
 
+        self.wall_nw = None
+        self.wall_ne = None
+        self.wall_sw = None
+        self.wall_se = None
+        self.char = None
+        self.highlighted = False
 
-@dataclass
-class CharSelected(ItemSelected):
-    item: BoardElement
 
-    @property
-    def char(self):
-        return self.item.char
+class Char(BoardElement):
 
+    def __init__(self, x, y, z, color):
+        super().__init__(x, y, z, color)
+        self.image = self.image_cache.get(
+            (type(self), tuple(color)), self.render)
 
-class Event:
-    def __init__(self):
-        self._triggers = defaultdict(list)
+    def render(self):
+        """
+        Draw the char on a new image and return it.
+        """
+        image = self.new_image()
+        pygame.draw.polygon(
+            image,
+            self.color,
+            ((self.size / 4, 10),
+             (self.size / 4 * 3, 10),
+             (self.size / 4 * 3, self.size - 30),
+             (self.size / 4, self.size - 30))
+        )
+        return image
 
-    def add_trigger(self, trigger, on_event: Type[BoardEvent]):
-        self._triggers[on_event].append(trigger)
 
-    def emit(self, event: BoardEvent):
-        for trigger in self._triggers[type(event)]:
-            trigger(event)
+class Cursor(BoardElement):
+    """
+    Outline of the element under the mouse, drawn over it by the board
+    instead of being part of each tile image.
+    """
 
+    def __init__(self, x=0, y=0, z=0, color=(30, 100, 230)):
+        super().__init__(x, y, z, color)
+        self.image = self.image_cache.get(
+            (type(self), tuple(color)), self.render)
 
-Event = Event()
+    @property
+    def layer(self):
+        # Right after the element, before the ones in front of it.
+        return self.depth(self.x, self.y, self.z) + 0.5
 
+    def render(self):
+        """
+        Draw the outline on a new image and return it.
+        """
+        image = self.new_image()
+        for points in ((self.g, self.d, self.d, self.a, self.c),
+                       (self.a, self.b, self.e, self.c),
+                       (self.d, self.c, self.f, self.g),
+                       (self.c, self.b, self.e, self.f)):
+            pygame.draw.polygon(image, self.color, points, 2)
+        return image
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Cache of bounded size evicting the least recently used entries.
+
+    hits and misses count the lookups served from the cache and the ones
+    that had to create the value.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, factory):
+        """
+        Get the value of key, calling factory() to create it when it is
+        not cached.
+        """
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            value = self._data[key] = factory()
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        else:
+            self.hits += 1
+            self._data.move_to_end(key)
+        return value
+
+    def clear(self):
+        """
+        Remove every entry and reset counters.
+        """
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,51 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Type
+
+from .model import Grid, TileRules
+
+
+@dataclass
+class BoardEvent:
+    board: Grid
+
+
+@dataclass
+class KeyEvent:
+    board: Grid
+    key: str
+
+
+@dataclass
+class ItemSelected(BoardEvent):
+    item: TileRules
+
+
+@dataclass
+class CharSelected(ItemSelected):
+    item: TileRules
+
+    @property
+    def char(self):
+        return self.item.char
+
+
+@dataclass
+class ActionPlanned(BoardEvent):
+    char: object
+    action: 'Action'
+
+
+class Event:
+    def __init__(self):
+        self._triggers = defaultdict(list)
+
+    def add_trigger(self, trigger, on_event: Type[BoardEvent]):
+        self._triggers[on_event].append(trigger)
+
+    def emit(self, event: BoardEvent):
+        for trigger in self._triggers[type(event)]:
+            trigger(event)
+
+
+Event = Event()
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+
+class Level:
+    """
+    Positions and tile types of the cubes of a level, stored as NumPy
+    arrays instead of one Python object per cube.
+
+    coords is an int32 array of shape (n, 3) holding x, y and z, types is
+    an uint8 array holding the latin-1 code of the tile character.
+
+    A level can be compiled to a binary file and memory-mapped back, see
+    `save`, `load` and `load_cached`.
+    """
+
+    magic = b'PGISOLV1'
+    header = np.dtype([('magic', 'S8'), ('count', '<u8')])
+
+    def __init__(self, coords, types):
+        self.coords = coords
+        self.types = types
+
+    @classmethod
+    def from_text(cls, level: str) -> 'Level':
+        """
+        Parse level text as `Board.read_level` does, without building
+        Python objects for each cube.
+
+        Tile characters must be latin-1 characters.
+        """
+        level = level.replace('\r\n', '\n').replace('\r', '\n')
+        codes = np.frombuffer(level.encode('latin-1'), dtype=np.uint8)
+        newlines = np.flatnonzero(codes == ord('\n'))
+
+        starts = np.concatenate(([0], newlines + 1))
+        ends = np.concatenate((newlines, [len(codes)]))
+        if level.endswith('\n'):
+            # Like str.splitlines, there is no line after the last newline.
+            starts, ends = starts[:-1], ends[:-1]
+
+        # An empty line starts the next z slice, y restarts from 0.
+        empty = starts == ends
+        line_z = np.cumsum(empty)
+        line_index = np.arange(len(starts))
+        last_empty = np.maximum.accumulate(np.where(empty, line_index, -1))
+        line_y = line_index - last_empty - 1
+
+        is_cube = codes != ord('\n')
+        cube_line = np.cumsum(codes == ord('\n'))[is_cube]
+        cube_x = np.flatnonzero(is_cube) - starts[cube_line]
+
+        coords = np.empty((len(cube_line), 3), dtype=np.int32)
+        coords[:, 0] = cube_x
+        coords[:, 1] = line_y[cube_line]
+        coords[:, 2] = (line_z[-1] if len(line_z) else 0) - \
+            line_z[cube_line]
+        return cls(coords, codes[is_cube].copy())
+
+    def __len__(self):
+        return len(self.types)
+
+    def __iter__(self):
+        """
+        Iterate over (x, y, z), tile character pairs.
+        """
+        return zip(map(tuple, self.coords.tolist()),
+                   self.types.tobytes().decode('latin-1'))
+
+    def save(self, path: str):
+        """
+        Write the compiled level to path.
+        """
+        header = np.array([(self.magic, len(self))], dtype=self.header)
+        with open(path, 'wb') as file:
+            file.write(header.tobytes())
+            file.write(np.ascontiguousarray(self.coords, '<i4').tobytes())
+            file.write(np.ascontiguousarray(self.types, 'u1').tobytes())
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'Level':
+        """
+        Read a compiled level, arrays are memory-mapped unless mmap is
+        False.
+
+        Raise ValueError if path is not a compiled level.
+        """
+        header = np.fromfile(path, dtype=cls.header, count=1)
+        if len(header) != 1 or header['magic'][0] != cls.magic:
+            raise ValueError(f'{path} is not a compiled level')
+
+        count = int(header['count'][0])
+        offset = cls.header.itemsize
+        if not count:
+            return cls(np.empty((0, 3), dtype=np.int32),
+                       np.empty(0, dtype=np.uint8))
+
+        if mmap:
+            coords = np.memmap(path, dtype='<i4', mode='r',
+                               offset=offset, shape=(count, 3))
+            types = np.memmap(path, dtype='u1', mode='r',
+                              offset=offset + coords.nbytes, shape=(count,))
+        else:
+            with open(path, 'rb') as file:
+                file.seek(offset)
+                coords = np.fromfile(file, dtype='<i4', count=count * 3)
+                types = np.fromfile(file, dtype='u1', count=count)
+            coords = coords.reshape(count, 3)
+        return cls(coords, types)
+
+    @classmethod
+    def load_cached(cls, level: str, cache_dir: str) -> 'Level':
+        """
+        Get level from its compiled file in cache_dir, compiling it on the
+        first call.
+        """
+        key = hashlib.sha256(level.encode('utf-8')).hexdigest()
+        path = os.path.join(cache_dir, f'{key}.pgl')
+        try:
+            return cls.load(path)
+        except (OSError, ValueError):
+            pass
+
+        compiled = cls.from_text(level)
+        os.makedirs(cache_dir, exist_ok=True)
+        # Written aside then renamed, so a partial file is never loaded.
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            compiled.save(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+        return compiled
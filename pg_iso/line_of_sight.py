@@ -0,0 +1,102 @@
+from typing import List, Optional
+
+from .algo import compute_path
+from .model import Grid, TileRules
+from .reachability import wall_between
+
+
+class Sight:
+    """
+    Result of a line of sight check.
+
+    boxes are the boxes seen along the line, up to the target or up to
+    the box holding the blocking char. A box behind a wall is not seen.
+    """
+
+    def __init__(self, boxes: List[TileRules], visible: bool):
+        self.boxes = boxes
+        self.visible = visible
+
+    def __bool__(self):
+        return self.visible
+
+
+class LineOfSight:
+    """
+    Check lines of sight on a board.
+
+    Results are cached by origin, target and board version, so the cache
+    is invalidated each time a char is placed or moved or the board is
+    rotated.
+    """
+
+    def __init__(self, board: Grid):
+        self.board = board
+        self._cache = {}
+        self._version = board.version
+
+    def _blocked(self, item: Optional[TileRules], x: int, y: int,
+                 dx: int, dy: int, z: int) -> bool:
+        """
+        Return True if walls block the step from item at x, y to the
+        (x + dx, y + dy) cell.
+        """
+        get_element = self.board.get_element
+        next_item = get_element(x + dx, y + dy, z)
+        if not dx or not dy:
+            return wall_between(item, next_item, dx, dy)
+
+        # A diagonal step goes through a corner and is blocked only when
+        # both ways around the corner are blocked.
+        for corner_dx, corner_dy in ((dx, 0), (0, dy)):
+            corner = get_element(x + corner_dx, y + corner_dy, z)
+            if not wall_between(item, corner, corner_dx, corner_dy) and \
+                    not wall_between(corner, next_item,
+                                     dx - corner_dx, dy - corner_dy):
+                return False
+        return True
+
+    def compute(self, x1: int, y1: int, x2: int, y2: int, z: int,
+                z2: int = None) -> Sight:
+        """
+        Check the line of sight from x1, y1 at level z to x2, y2 at level
+        z2, z by default.
+        """
+        if z2 is None:
+            z2 = z
+        if self._version != self.board.version:
+            self._cache.clear()
+            self._version = self.board.version
+
+        key = (x1, y1, x2, y2, z, z2, self._version)
+        sight = self._cache.get(key)
+        if sight is None:
+            sight = self._cache[key] = self._compute(x1, y1, x2, y2, z, z2)
+        return sight
+
+    def _compute(self, x1: int, y1: int, x2: int, y2: int, z: int,
+                 z2: int) -> Sight:
+        boxes = []
+        x, y = x1, y1
+        item = self.board.get_element(x, y, z)
+        line = list(compute_path(x1, y1, x2, y2))
+        for i, (next_x, next_y) in enumerate(line, 1):
+            # The line goes from level z to level z2 along the cells.
+            level = z + round((z2 - z) * i / len(line))
+            if self._blocked(item, x, y, next_x - x, next_y - y, level):
+                return Sight(boxes, False)
+
+            x, y = next_x, next_y
+            target = (x, y) == (x2, y2)
+            top = self.board.top(x, y)
+            if top is not None and top.z > level and not target:
+                # Higher ground hides the rest of the line.
+                return Sight(boxes, False)
+
+            item = self.board.get_element(x, y, level)
+            if item is not None:
+                boxes.append(item)
+                if item.char is not None and not target:
+                    return Sight(boxes, False)
+
+        return Sight(boxes, True)
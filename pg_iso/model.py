@@ -0,0 +1,614 @@
+"""
+Game model: tiles, walls, chars and the rules moving them.
+
+This module does not depend on pygame, so games can be simulated without
+a display. `pg_iso.board.Board` is the view of a `Grid` drawn with
+sprites.
+"""
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+
+# Walls of the tiles built from each level character.
+TILE_WALLS = {
+    'b': ('wall_nw', 'wall_ne'),
+    'x': ('wall_nw',),
+    'y': ('wall_ne',),
+    'w': (),
+}
+
+# Bit of each wall in the wall mask of a tile.
+WALL_BITS = (('wall_nw', 1), ('wall_ne', 2), ('wall_sw', 4), ('wall_se', 8))
+# Bit of the wall on the side of a tile facing each direction, see
+# `TileRules.wall_towards`.
+WALL_TOWARDS = {(1, 0): 2, (-1, 0): 4, (0, 1): 8, (0, -1): 1}
+# Bits of the cell masks of a grid, besides the wall bits, see `CellMasks`.
+OCCUPIED = 16
+PRESENT = 32
+
+
+def read_level(level: str):
+    """
+    Read level and return position of each cube
+    """
+    positions = []
+    z = 0
+    y = 0
+    for line in level.splitlines():
+        if not line:
+            z += 1
+            y = 0
+            continue
+
+        for x, char in enumerate(line):
+            positions.append(([x, y, z], char))
+        y += 1
+
+    for pos, _ in positions:
+        pos[2] = z - pos[2]
+
+    return positions
+
+
+class TileRules:
+    """
+    Rules of a tile which can hold a char and have walls, shared by
+    `Tile` and the boxes drawn on the board.
+    """
+
+    __slots__ = ()
+
+    move_cost: int = 1
+
+    def wall_towards(self, dx: int, dy: int):
+        """
+        Get the wall on the side of the box facing the (x + dx, y + dy)
+        neighbour.
+        """
+        if dx > 0:
+            return self.wall_ne
+        if dx < 0:
+            return self.wall_sw
+        if dy > 0:
+            return self.wall_se
+        if dy < 0:
+            return self.wall_nw
+
+    def rotate_walls(self, reverse: bool = False):
+        """
+        Turn the walls a quarter, as the board rotates, backwards when
+        reverse is True.
+        """
+        if reverse:
+            self.wall_nw, self.wall_ne, self.wall_se, self.wall_sw = \
+                self.wall_ne, self.wall_se, self.wall_sw, self.wall_nw
+        else:
+            self.wall_nw, self.wall_ne, self.wall_se, self.wall_sw = \
+                self.wall_sw, self.wall_nw, self.wall_ne, self.wall_se
+
+    def update(self):
+        pass
+
+
+class Tile(TileRules):
+
+    __slots__ = ('x', 'y', 'z', 'wall_nw', 'wall_ne', 'wall_sw', 'wall_se',
+                 'char', 'highlighted')
+
+    def __init__(self, x: int, y: int, z: int):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.wall_nw = None
+        self.wall_ne = None
+        self.wall_sw = None
+        self.wall_se = None
+        self.char = None
+        self.highlighted = False
+
+    def rotate(self, reverse: bool = False):
+        self.rotate_walls(reverse)
+
+    def __repr__(self):
+        return f'Tile({self.x}, {self.y}, {self.z})'
+
+
+class Character:
+
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, x: int = 0, y: int = 0, z: int = 0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __repr__(self):
+        return f'Character({self.x}, {self.y}, {self.z})'
+
+
+def tile_mask(tile: 'TileRules') -> int:
+    """
+    Get the `CellMasks` bits of tile.
+    """
+    mask = PRESENT
+    for wall, bit in WALL_BITS:
+        if getattr(tile, wall) is not None:
+            mask |= bit
+    if tile.char is not None:
+        mask |= OCCUPIED
+    return mask
+
+
+def _rotate_mask(mask: int) -> int:
+    # The wall bits turn like `TileRules.rotate_walls`.
+    nw, ne, sw, se = (bool(mask & bit) for _, bit in WALL_BITS)
+    return (mask & ~0xf) | sw * 1 | nw * 2 | se * 4 | ne * 8
+
+
+_ROTATED_MASKS = np.array([_rotate_mask(mask) for mask in range(64)],
+                          dtype=np.uint8)
+# Three quarter turns are one backwards.
+_REVERSED_MASKS = _ROTATED_MASKS[_ROTATED_MASKS[_ROTATED_MASKS]]
+
+
+class CellMasks:
+    """
+    One byte per x, y, z cell of a grid: the `WALL_BITS` of its tile,
+    PRESENT when there is a tile and OCCUPIED when it holds a char.
+
+    cells is the array of the masks, of shape (x, y, z), its index i, j,
+    k being the position origin + (i, j, k). The grid keeps it in sync
+    when tiles are added or removed, chars are placed or moved and the
+    grid is rotated. Walls changed by hand are synced by `update`.
+    """
+
+    def __init__(self, tiles=()):
+        self.rebuild(tiles)
+
+    def rebuild(self, tiles) -> None:
+        """
+        Compute the masks of the cells of tiles, and only them.
+        """
+        tiles = list(tiles)
+        if tiles:
+            self.origin = (min(tile.x for tile in tiles),
+                           min(tile.y for tile in tiles),
+                           min(tile.z for tile in tiles))
+            shape = (max(tile.x for tile in tiles) - self.origin[0] + 1,
+                     max(tile.y for tile in tiles) - self.origin[1] + 1,
+                     max(tile.z for tile in tiles) - self.origin[2] + 1)
+        else:
+            self.origin = (0, 0, 0)
+            shape = (0, 0, 0)
+        self.cells = np.zeros(shape, dtype=np.uint8)
+        for tile in tiles:
+            self.cells[self.index(tile.x, tile.y, tile.z)] = tile_mask(tile)
+
+    def index(self, x: int, y: int, z: int):
+        """
+        Get the index of position in cells, None if it is outside.
+        """
+        origin_x, origin_y, origin_z = self.origin
+        size_x, size_y, size_z = self.cells.shape
+        x -= origin_x
+        y -= origin_y
+        z -= origin_z
+        if 0 <= x < size_x and 0 <= y < size_y and 0 <= z < size_z:
+            return x, y, z
+        return None
+
+    def get(self, x: int, y: int, z: int) -> int:
+        """
+        Get the mask of the cell at position, 0 outside of the grid.
+        """
+        index = self.index(x, y, z)
+        return 0 if index is None else self.cells.item(index)
+
+    def update(self, tile: 'TileRules') -> None:
+        """
+        Compute the mask of the cell of tile again.
+        """
+        index = self.index(tile.x, tile.y, tile.z)
+        if index is None:
+            self._grow(tile.x, tile.y, tile.z)
+            index = self.index(tile.x, tile.y, tile.z)
+        self.cells[index] = tile_mask(tile)
+
+    def remove(self, tile: 'TileRules') -> None:
+        """
+        Clear the cell of tile, removed from the grid.
+        """
+        index = self.index(tile.x, tile.y, tile.z)
+        if index is not None:
+            self.cells[index] = 0
+
+    def _grow(self, x: int, y: int, z: int):
+        position = (x, y, z)
+        if not self.cells.size:
+            low = high = position
+        else:
+            low = tuple(min(origin, value)
+                        for origin, value in zip(self.origin, position))
+            high = tuple(max(origin + size - 1, value)
+                         for origin, size, value in zip(
+                             self.origin, self.cells.shape, position))
+        cells = np.zeros([top - bottom + 1 for bottom, top in zip(low, high)],
+                         dtype=np.uint8)
+        if self.cells.size:
+            start = [origin - bottom
+                     for origin, bottom in zip(self.origin, low)]
+            cells[tuple(slice(begin, begin + size) for begin, size in
+                        zip(start, self.cells.shape))] = self.cells
+        self.origin = low
+        self.cells = cells
+
+    def rotate(self, reverse: bool = False) -> None:
+        """
+        Turn the cells a quarter around 0, 0, x, y becoming -y, x, or y,
+        -x when reverse is True, and their walls with them.
+
+        The grid then moves them in place with `translate`.
+        """
+        x, y, z = self.origin
+        size_x, size_y, _ = self.cells.shape
+        if reverse:
+            self.origin = (y, -x - size_x + 1, z)
+            self.cells = _REVERSED_MASKS[self.cells[::-1].transpose(1, 0, 2)]
+        else:
+            self.origin = (-y - size_y + 1, x, z)
+            self.cells = _ROTATED_MASKS[self.cells.transpose(1, 0, 2)[::-1]]
+
+    def translate(self, dx: int, dy: int) -> None:
+        """
+        Move the cells by dx, dy.
+        """
+        x, y, z = self.origin
+        self.origin = (x + dx, y + dy, z)
+
+    def can_move(self, x: int, y: int, z: int, dx: int, dy: int,
+                 next_z: int) -> bool:
+        """
+        Bit version of `pg_iso.reachability.can_move`, from the tile at x,
+        y, z to the x + dx, y + dy, next_z one.
+        """
+        mask = self.get(x + dx, y + dy, next_z)
+        return (mask & (PRESENT | OCCUPIED) == PRESENT and
+                not mask & WALL_TOWARDS[-dx, -dy] and
+                not self.get(x, y, z) & WALL_TOWARDS[dx, dy])
+
+
+class Grid:
+    """
+    Tiles indexed by position, the chars placed on them and the
+    highlighted tiles.
+
+    version is incremented each time chars, tiles or orientation change.
+
+    When log is set, changes of chars and orientation are recorded to it,
+    see `StateLog`.
+
+    masks holds the walls and chars of each cell as bits, see
+    `CellMasks`.
+    """
+
+    log: Optional['StateLog'] = None
+
+    def __init__(self, tiles=()):
+        self._index: Dict[Tuple[int, int, int], TileRules] = {
+            (tile.x, tile.y, tile.z): tile for tile in tiles}
+        self._highlighted = set()
+        self.version = 0
+        # Tiles of each x, y column by z, and the top tile of each column.
+        self._columns: Dict[Tuple[int, int], Dict[int, TileRules]] = {}
+        self._tops: Dict[Tuple[int, int], TileRules] = {}
+        self._index_columns()
+        self.masks = CellMasks(self._index.values())
+
+    @classmethod
+    def from_level(cls, level: str) -> 'Grid':
+        """
+        Build the grid of level, see `read_level` and `TILE_WALLS`.
+        """
+        tiles = []
+        for position, type_ in read_level(level):
+            tile = Tile(*position)
+            for wall in TILE_WALLS[type_]:
+                setattr(tile, wall, True)
+            tiles.append(tile)
+        return cls(tiles)
+
+    def __iter__(self) -> Iterator[TileRules]:
+        return iter(self._index.values())
+
+    def __len__(self):
+        return len(self._index)
+
+    def get_element(self, x: int, y: int, z: int):
+        """
+        Get element from position x, y and z
+
+        Return None if element is not found.
+        """
+        return self._index.get((x, y, z))
+
+    def _index_columns(self):
+        self._columns.clear()
+        self._tops.clear()
+        for tile in self._index.values():
+            self._add_to_columns(tile)
+
+    def _add_to_columns(self, tile):
+        key = (tile.x, tile.y)
+        column = self._columns.get(key)
+        if column is None:
+            column = self._columns[key] = {}
+        column[tile.z] = tile
+        top = self._tops.get(key)
+        if top is None or tile.z >= top.z:
+            self._tops[key] = tile
+
+    def _remove_from_columns(self, tile):
+        key = (tile.x, tile.y)
+        column = self._columns.get(key, {})
+        if column.get(tile.z) is not tile:
+            return
+
+        del column[tile.z]
+        if not column:
+            del self._columns[key]
+            del self._tops[key]
+        elif self._tops[key] is tile:
+            self._tops[key] = column[max(column)]
+
+    def column(self, x: int, y: int):
+        """
+        Get the z levels of the tiles of the x, y column, from the bottom.
+        """
+        return sorted(self._columns.get((x, y), ()))
+
+    def top(self, x: int, y: int):
+        """
+        Get the top standable tile of the x, y column, None if the column
+        is empty.
+        """
+        return self._tops.get((x, y))
+
+    def landing(self, x: int, y: int, z: int, max_climb: int = 0,
+                max_drop: int = 0):
+        """
+        Get the standable tile of the x, y column closest to level z, at
+        most max_climb levels above or max_drop below, and the same level
+        first.
+
+        A tile is standable when there is no tile right above it. Return
+        None if there is no such tile.
+        """
+        column = self._columns.get((x, y))
+        if column is None:
+            return None
+
+        tile = column.get(z)
+        if tile is not None and z + 1 not in column:
+            return tile
+
+        for dz in range(1, max(max_climb, max_drop) + 1):
+            if dz <= max_climb:
+                tile = column.get(z + dz)
+                if tile is not None and z + dz + 1 not in column:
+                    return tile
+            if dz <= max_drop:
+                tile = column.get(z - dz)
+                if tile is not None and z - dz + 1 not in column:
+                    return tile
+        return None
+
+    def place_char(self, char, x: int, y: int, z: int) -> None:
+        item = self.get_element(x, y, z)
+        if not isinstance(item, TileRules):
+            raise TypeError(f'{x} {y} {z} is not a box')
+
+        # TODO if char is already placed
+        if self.log is not None:
+            self.log.record_char(item, char)
+        char.x, char.y, char.z = x, y, z
+        item.char = char
+        item.update()
+        self.masks.update(item)
+        self.version += 1
+
+    def remove_char(self, char) -> None:
+        item = self.get_element(char.x, char.y, char.z)
+        if item is not None and item.char is char:
+            if self.log is not None:
+                self.log.record_char(item, None)
+            item.char = None
+            item.update()
+            self.masks.update(item)
+            self.version += 1
+
+    def move_char(self, char, x: int, y: int, z: int) -> None:
+        self.remove_char(char)
+        self.place_char(char, x, y, z)
+
+    def chars(self):
+        """
+        Get (char, (x, y, z)) of each char of the grid.
+        """
+        return [(tile.char, (tile.x, tile.y, tile.z))
+                for tile in self if tile.char is not None]
+
+    @property
+    def highlighted(self):
+        """
+        Highlighted boxes, see `set_highlighted`.
+        """
+        return frozenset(self._highlighted)
+
+    def set_highlighted(self, boxes) -> None:
+        """
+        Highlight boxes, and only them.
+
+        Only the boxes whose state changes are updated.
+        """
+        boxes = set(boxes)
+        for box in self._highlighted - boxes:
+            box.highlighted = False
+            box.update()
+        for box in boxes - self._highlighted:
+            box.highlighted = True
+            box.update()
+        self._highlighted = boxes
+
+    def rotate(self, reverse: bool = False):
+        """
+        Rotate the grid a quarter, like `pg_iso.board.Board.rotate`, or
+        back when reverse is True.
+        """
+        tiles = list(self._index.values())
+        reference = tiles[0]
+        previous = (reference.x, reference.y)
+        if reverse:
+            offset = max(tile.x for tile in tiles)
+        else:
+            offset = max(tile.y for tile in tiles)
+        for tile in tiles:
+            if reverse:
+                tile.x, tile.y = tile.y, offset - tile.x
+            else:
+                tile.x, tile.y = offset - tile.y, tile.x
+            tile.rotate(reverse)
+            if tile.char is not None:
+                tile.char.x, tile.char.y, tile.char.z = \
+                    tile.x, tile.y, tile.z
+        self._index = {(tile.x, tile.y, tile.z): tile for tile in tiles}
+        self._index_columns()
+        self._rotate_masks(reference, previous, reverse)
+        self.version += 1
+        if self.log is not None:
+            self.log.record_rotation(reverse)
+
+    def _rotate_masks(self, reference, previous, reverse: bool) -> None:
+        """
+        Turn the masks like the tiles, reference being a tile at the
+        previous x, y position before the turn.
+        """
+        x, y = previous
+        x, y = (y, -x) if reverse else (-y, x)
+        self.masks.rotate(reverse)
+        self.masks.translate(reference.x - x, reference.y - y)
+
+
+class StateLog:
+    """
+    Undo log of the chars and orientation of a grid.
+
+    While a state is marked by `push`, place_char, remove_char,
+    move_char and rotate record deltas: the tile and the previous char
+    and position, or a quarter turn. `pop` rolls back to the last mark,
+    undoing only the deltas recorded since. Nothing is copied, sprites
+    included.
+
+    `snapshot` gives a compact full state that `restore` goes back to,
+    for states farther than the marks.
+    """
+
+    def __init__(self, grid: Grid):
+        self.grid = grid
+        # Quarter turns of the grid since the log is attached.
+        self.rotation = 0
+        self._deltas = []
+        self._marks = []
+        self._replaying = False
+        grid.log = self
+
+    def __len__(self):
+        return len(self._deltas)
+
+    @property
+    def depth(self) -> int:
+        return len(self._marks)
+
+    def reset(self) -> None:
+        """
+        Forget the marks and deltas, after the grid tiles are built again
+        in their first orientation.
+        """
+        self.rotation = 0
+        self._deltas.clear()
+        self._marks.clear()
+
+    def record_char(self, tile: TileRules, char) -> None:
+        """
+        Record that char, or no char if it is None, is placed on tile.
+        """
+        if self._marks and not self._replaying:
+            position = None if char is None else (char.x, char.y, char.z)
+            self._deltas.append((tile, tile.char, char, position))
+
+    def record_rotation(self, reverse: bool = False) -> None:
+        """
+        Record a quarter turn of the grid, backwards when reverse is True.
+        """
+        self.rotation = (self.rotation + (-1 if reverse else 1)) % 4
+        if self._marks and not self._replaying:
+            self._deltas.append(reverse)
+
+    def push(self) -> None:
+        """
+        Mark the current state, see `pop`.
+        """
+        self._marks.append(len(self._deltas))
+
+    def pop(self) -> None:
+        """
+        Roll back to the state of the last `push`.
+        """
+        mark = self._marks.pop()
+        self._replaying = True
+        try:
+            while len(self._deltas) > mark:
+                self._undo(self._deltas.pop())
+        finally:
+            self._replaying = False
+
+    def commit(self) -> None:
+        """
+        Forget the last mark, keeping the changes made since.
+        """
+        self._marks.pop()
+        if not self._marks:
+            self._deltas.clear()
+
+    def _undo(self, delta):
+        grid = self.grid
+        if isinstance(delta, bool):
+            # A quarter turn, reverse or not.
+            grid.rotate(reverse=not delta)
+            return
+
+        tile, previous, char, position = delta
+        tile.char = previous
+        if char is not None:
+            char.x, char.y, char.z = position
+        tile.update()
+        grid.masks.update(tile)
+        grid.version += 1
+
+    def snapshot(self):
+        """
+        Get the orientation and the chars positions of the grid.
+        """
+        return self.rotation, tuple(self.grid.chars())
+
+    def restore(self, snapshot) -> None:
+        """
+        Go back to a state got by `snapshot`, as recorded changes.
+        """
+        rotation, chars = snapshot
+        while self.rotation != rotation:
+            self.grid.rotate(reverse=(rotation - self.rotation) % 4 == 3)
+        for char, _ in self.grid.chars():
+            self.grid.remove_char(char)
+        for char, position in chars:
+            self.grid.place_char(char, *position)
@@ -0,0 +1,148 @@
+import json
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+
+import pygame
+
+
+class FrameProfiler:
+    """
+    Collect the duration of each phase of a frame and counters, such as
+    the number of tiles redrawn.
+
+    Milestones, such as the time to the first frame, are recorded once
+    in ms since the profiler start.
+
+    When a trace file is opened, each frame is written as a JSON line.
+    """
+
+    def __init__(self):
+        self.frame = 0
+        self.phases = {}
+        self.counters = Counter()
+        self.milestones = {}
+        self.last_frame = None
+        self.start = perf_counter()
+        self._new_milestones = {}
+        self._trace = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Time the code run in the context as the name phase.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = \
+                self.phases.get(name, 0) + perf_counter() - start
+
+    def count(self, name: str, number: int = 1):
+        self.counters[name] += number
+
+    def milestone(self, name: str):
+        """
+        Record the first time name is reached.
+        """
+        if name not in self.milestones:
+            self.milestones[name] = self._new_milestones[name] = \
+                (perf_counter() - self.start) * 1000
+
+    def end_frame(self) -> dict:
+        """
+        Record the current frame and start the next one.
+
+        Return the recorded frame, durations are in ms.
+        """
+        self.last_frame = {
+            'frame': self.frame,
+            'phases': {name: duration * 1000
+                       for name, duration in self.phases.items()},
+            'counters': dict(self.counters),
+        }
+        if self._new_milestones:
+            self.last_frame['milestones'] = self._new_milestones
+        if self._trace is not None:
+            self._trace.write(json.dumps(self.last_frame) + '\n')
+
+        self.frame += 1
+        self.phases = {}
+        self.counters = Counter()
+        self._new_milestones = {}
+        return self.last_frame
+
+    def open_trace(self, path: str):
+        """
+        Write each next frame as a JSON line to path.
+        """
+        self.close_trace()
+        self._trace = open(path, 'w')
+
+    def close_trace(self):
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
+
+
+PROFILER = FrameProfiler()
+
+
+class Hud:
+    """
+    Overlay showing the last frame recorded by a profiler.
+    """
+
+    color = (255, 255, 255)
+    background = (20, 20, 20)
+    margin = 4
+
+    def __init__(self, profiler: FrameProfiler, position=(0, 0)):
+        self.profiler = profiler
+        self.position = position
+        self.visible = False
+        self._font = None
+        self.rect = pygame.Rect(position, (0, 0))
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.rect = pygame.Rect(self.position, (0, 0))
+
+    def lines(self, fps: float = None):
+        frame = self.profiler.last_frame
+        if frame is None:
+            return []
+
+        lines = [] if fps is None else [f'fps {fps:9.1f}']
+        lines.extend(f'{name:<8} {duration:6.2f} ms'
+                     for name, duration in frame['phases'].items())
+        lines.extend(f'{name:<16} {number}'
+                     for name, number in frame['counters'].items())
+        lines.extend(f'{name:<16} {time:8.1f} ms'
+                     for name, time in self.profiler.milestones.items())
+        return lines
+
+    def draw(self, surface, fps: float = None):
+        """
+        Draw the overlay on surface and return its rect.
+        """
+        if self._font is None:
+            pygame.font.init()
+            self._font = pygame.font.Font(None, 20)
+
+        images = [self._font.render(line, True, self.color)
+                  for line in self.lines(fps)]
+        width = max((image.get_width() for image in images), default=0)
+        height = sum(image.get_height() for image in images)
+        # The overlay never shrinks, so it always covers the last one.
+        self.rect = self.rect.union(pygame.Rect(
+            self.position,
+            (width + 2 * self.margin, height + 2 * self.margin)))
+
+        surface.fill(self.background, self.rect)
+        y = self.rect.y + self.margin
+        for image in images:
+            surface.blit(image, (self.rect.x + self.margin, y))
+            y += image.get_height()
+        return self.rect
@@ -0,0 +1,132 @@
+from heapq import heappop, heappush
+from itertools import count
+from typing import Callable, Dict, List, Optional
+
+from .model import Grid, TileRules
+
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+# Levels a char can step up or down, and the cost of each level.
+MAX_CLIMB = 1
+MAX_DROP = 2
+CLIMB_COST = 1
+DROP_COST = 0
+
+
+def wall_between(item: Optional[TileRules], next_item: Optional[TileRules],
+                 dx: int, dy: int) -> bool:
+    """
+    Return True if a wall separates item from the next_item neighbour
+    located at (dx, dy). A missing box has no wall.
+    """
+    return ((item is not None and
+             item.wall_towards(dx, dy) is not None) or
+            (next_item is not None and
+             next_item.wall_towards(-dx, -dy) is not None))
+
+
+def can_move(item: TileRules, next_item: Optional[TileRules],
+             dx: int, dy: int) -> bool:
+    """
+    Return True if a char standing on item can step on the next_item
+    neighbour located at (dx, dy).
+    """
+    return (next_item is not None and
+            next_item.char is None and
+            not wall_between(item, next_item, dx, dy))
+
+
+class Reachable:
+    """
+    Boxes reachable from a start box.
+
+    Each box is given once with its move cost from the start box and
+    its predecessor on a cheapest path.
+    """
+
+    def __init__(self, start: TileRules):
+        self.start = start
+        self.distance: Dict[TileRules, int] = {start: 0}
+        self.predecessor: Dict[TileRules, Optional[TileRules]] = {start: None}
+
+    def __contains__(self, box):
+        return box is not self.start and box in self.distance
+
+    def __iter__(self):
+        return (box for box in self.distance if box is not self.start)
+
+    def __len__(self):
+        return len(self.distance) - 1
+
+    def path_to(self, box: TileRules) -> List[TileRules]:
+        """
+        Get boxes to walk through from the start box (excluded) to box
+        (included).
+
+        Raise KeyError if box is not reachable.
+        """
+        path = []
+        while box is not self.start:
+            path.append(box)
+            box = self.predecessor[box]
+        path.reverse()
+        return path
+
+
+def compute_reachable(board: Grid, x: int, y: int, z: int, max_cost: int,
+                      cost: Callable[[TileRules], int] = None,
+                      max_climb: int = MAX_CLIMB, max_drop: int = MAX_DROP,
+                      climb_cost: int = CLIMB_COST,
+                      drop_cost: int = DROP_COST) -> Reachable:
+    """
+    Find boxes reachable from x, y, z spending at most max_cost.
+
+    A step leads to the standable box of the neighbour column closest to
+    the current level, see `Grid.landing`. Each level climbed costs
+    climb_cost and each level dropped costs drop_cost, on top of the
+    cost of the box.
+
+    :param cost: callable returning the cost to step on a box,
+                 `TileRules.move_cost` is used by default.
+    """
+    if cost is None:
+        def cost(box):
+            return box.move_cost
+
+    start = board.get_element(x, y, z)
+    reachable = Reachable(start)
+    distance = reachable.distance
+    predecessor = reachable.predecessor
+    tie = count()
+    queue = [(0, next(tie), start)]
+    while queue:
+        dist, _, item = heappop(queue)
+        if dist > distance[item]:
+            continue
+
+        for dx, dy in DIRECTIONS:
+            next_item = board.landing(item.x + dx, item.y + dy, item.z,
+                                      max_climb, max_drop)
+            if not can_move(item, next_item, dx, dy):
+                continue
+
+            dz = next_item.z - item.z
+            next_dist = dist + cost(next_item) + \
+                (climb_cost * dz if dz > 0 else -drop_cost * dz)
+            if next_dist <= max_cost and \
+                    next_dist < distance.get(next_item, next_dist + 1):
+                distance[next_item] = next_dist
+                predecessor[next_item] = item
+                heappush(queue, (next_dist, next(tie), next_item))
+
+    return reachable
+
+
+def compute_area(board: Grid, x: int, y: int, z: int,
+                 nb_steps: int) -> List[TileRules]:
+    """
+    Get boxes reachable from x, y, z in at most nb_steps, climbing and
+    dropping as `compute_reachable`.
+    """
+    return list(compute_reachable(board, x, y, z, nb_steps))
@@ -0,0 +1,167 @@
+"""
+States of the game, switched by the board events.
+
+States only use the rules of the model, see `pg_iso.model.Grid`, so they
+run the same on a board or on a display-free grid.
+"""
+from collections.abc import MutableMapping
+
+from .events import ActionPlanned, CharSelected, ItemSelected, KeyEvent
+from .reachability import compute_area
+
+
+def play_move(board, char, x: int, y: int, z: int) -> None:
+    """
+    Move char as a turn, which can be undone when the board has a log,
+    see `pg_iso.model.StateLog`.
+    """
+    if board.log is not None:
+        board.log.push()
+    board.move_char(char, x, y, z)
+
+
+class StateContext(MutableMapping):
+
+    def __init__(self, first_state_cls):
+        self._state = first_state_cls(self)
+        self._data = {}
+
+    def switch_state(self, state_cls):
+        self._state = state_cls(self)
+
+    def on_item_selected(self, event: ItemSelected):
+        self._state.on_item_selected(event)
+
+    def on_char_selected(self, event: CharSelected):
+        self._state.on_char_selected(event)
+
+    def on_key_pressed(self, event: KeyEvent):
+        self._state.on_attack_selected(event)
+
+    def on_action_planned(self, event: ActionPlanned):
+        self._state.on_action_planned(event)
+
+    def __getitem__(self, item):
+        return self._data[item]
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class State:
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def on_item_selected(self, event: ItemSelected):
+        pass
+
+    def on_char_selected(self, event: CharSelected):
+        pass
+
+    def on_attack_selected(self, event: 'AttackEvent'):
+        pass
+
+    def on_action_planned(self, event: ActionPlanned):
+        """
+        Play the action chosen by the planner, see `pg_iso.ai`.
+        """
+        event.board.set_highlighted(())
+        if event.action.move_to != (event.char.x, event.char.y,
+                                    event.char.z):
+            play_move(event.board, event.char, *event.action.move_to)
+        self.ctx.switch_state(ViewState)
+
+
+class ViewState(State):
+
+    def on_char_selected(self, event: CharSelected):
+        event.board.set_highlighted(compute_area(event.board,
+                                                 event.char.x,
+                                                 event.char.y,
+                                                 event.char.z, 2))
+
+        self.ctx['char_to_move'] = event.char
+        self.ctx.switch_state(MoveState)
+
+    def on_item_selected(self, event: ItemSelected):
+        event.board.set_highlighted(())
+        self.ctx.switch_state(ViewState)
+
+    def on_attack_selected(self, event):
+        self.ctx.switch_state(ViewState)
+
+
+class MoveState(State):
+
+    def on_char_selected(self, event: CharSelected):
+        event.board.set_highlighted(compute_area(event.board,
+                                                 event.char.x,
+                                                 event.char.y,
+                                                 event.char.z, 2))
+
+        self.ctx['char_to_move'] = event.char
+        self.ctx.switch_state(MoveState)
+
+    def on_item_selected(self, event: ItemSelected):
+        char_to_move = self.ctx['char_to_move']
+        if event.item in event.board.highlighted:
+            play_move(
+                event.board,
+                char_to_move,
+                event.item.x,
+                event.item.y,
+                event.item.z)
+
+        event.board.set_highlighted(())
+
+        self.ctx.switch_state(ViewState)
+
+    def on_attack_selected(self, event):
+        event.board.set_highlighted(())
+        self.ctx.switch_state(AttackState)
+
+
+class AttackState(State):
+
+    def on_char_selected(self, event: CharSelected):
+        char = self.ctx['char_to_move']
+        event.board.set_highlighted(
+            self.ctx['line_of_sight'].compute(char.x,
+                                              char.y,
+                                              event.char.x,
+                                              event.char.y,
+                                              char.z,
+                                              event.char.z).boxes)
+
+        self.ctx.switch_state(AttackState)
+
+    def on_item_selected(self, event: ItemSelected):
+        char = self.ctx['char_to_move']
+        event.board.set_highlighted(
+            self.ctx['line_of_sight'].compute(char.x,
+                                              char.y,
+                                              event.item.x,
+                                              event.item.y,
+                                              char.z,
+                                              event.item.z).boxes)
+
+        self.ctx.switch_state(AttackState)
+
+    def on_attack_selected(self, event):
+        char = self.ctx['char_to_move']
+        event.board.set_highlighted(compute_area(event.board,
+                                                 char.x,
+                                                 char.y,
+                                                 char.z, 2))
+
+        self.ctx.switch_state(MoveState)
@@ -0,0 +1,185 @@
+"""
+Threat maps: the tiles every char can reach or attack, computed for all
+chars at once with NumPy.
+
+The cell masks of a grid are split into `TileArrays`, arrays indexed by
+x, y and z. Moves follow the rules of `pg_iso.reachability.compute_reachable`
+and are relaxed for every char and every tile in each pass.
+"""
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from .model import OCCUPIED, PRESENT, WALL_TOWARDS, Grid, TileRules
+from .reachability import (CLIMB_COST, DIRECTIONS, DROP_COST, MAX_CLIMB,
+                           MAX_DROP)
+
+# Distance of the lines an attack reaches, see `pg_iso.algo.compute_line`.
+ATTACK_RANGE = 3
+
+
+def _shift(array, dx: int, dy: int, dz: int, fill):
+    """
+    Get array shifted on its last three axes: the x, y, z item of the
+    result is the x + dx, y + dy, z + dz item of array, fill outside.
+    """
+    result = np.full_like(array, fill)
+    target = [Ellipsis]
+    source = [Ellipsis]
+    for delta, size in zip((dx, dy, dz), array.shape[-3:]):
+        if abs(delta) >= size:
+            return result
+        target.append(slice(max(0, -delta), size - max(0, delta)))
+        source.append(slice(max(0, delta), size - max(0, -delta)))
+    result[tuple(target)] = array[tuple(source)]
+    return result
+
+
+class TileArrays:
+    """
+    Tiles, walls and chars of a grid as arrays of shape (x, y, z).
+
+    present marks the tiles, walls holds their `WALL_BITS` masks, cost
+    their move cost, occupied the tiles holding a char and standable the
+    tiles with no tile right above them. Index i, j, k is the position
+    origin + (i, j, k), as in the `pg_iso.model.CellMasks` of the grid.
+    """
+
+    def __init__(self, grid: Grid):
+        masks = grid.masks
+        self.origin = masks.origin
+        self.present = (masks.cells & PRESENT) != 0
+        self.walls = masks.cells & 0xf
+        self.occupied = (masks.cells & OCCUPIED) != 0
+        self.cost = self.present * TileRules.move_cost
+        for tile in grid:
+            if tile.move_cost != TileRules.move_cost:
+                self.cost[masks.index(tile.x, tile.y, tile.z)] = \
+                    tile.move_cost
+        self.standable = self.present & ~_shift(self.present, 0, 0, 1, False)
+
+    @property
+    def shape(self):
+        return self.present.shape
+
+    def index(self, x: int, y: int, z: int):
+        return x - self.origin[0], y - self.origin[1], z - self.origin[2]
+
+    def moves(self, max_climb: int = MAX_CLIMB, max_drop: int = MAX_DROP,
+              climb_cost: int = CLIMB_COST, drop_cost: int = DROP_COST):
+        """
+        Yield (dx, dy, dz, allowed, cost) for each step a char can take.
+
+        allowed marks the tiles a char can step from onto the x + dx,
+        y + dy, z + dz tile, that is the landing tile of
+        `pg_iso.model.Grid.landing`, and cost is the cost of the step.
+        """
+        order = [0]
+        for dz in range(1, max(max_climb, max_drop) + 1):
+            if dz <= max_climb:
+                order.append(dz)
+            if dz <= max_drop:
+                order.append(-dz)
+
+        for dx, dy in DIRECTIONS:
+            landed = np.zeros(self.shape, dtype=bool)
+            blocked = (self.walls & WALL_TOWARDS[dx, dy]) != 0
+            for dz in order:
+                standable = _shift(self.standable, dx, dy, dz, False)
+                lands = standable & ~landed
+                landed |= standable
+
+                free = ~_shift(self.occupied, dx, dy, dz, True)
+                wall = blocked | ((_shift(self.walls, dx, dy, dz, 0) &
+                                   WALL_TOWARDS[-dx, -dy]) != 0)
+                allowed = self.present & lands & free & ~wall
+                cost = _shift(self.cost, dx, dy, dz, 0) + \
+                    (climb_cost * dz if dz > 0 else -drop_cost * dz)
+                yield dx, dy, dz, allowed, cost
+
+    def tiles(self, grid: Grid, mask) -> List[TileRules]:
+        """
+        Get the tiles of grid marked in mask, of shape (x, y, z).
+        """
+        return [grid.get_element(*(int(value) for value in index))
+                for index in np.argwhere(mask & self.present) + self.origin]
+
+
+@dataclass
+class ThreatMap:
+    """
+    Result of `compute_threats`, for chars in order.
+
+    distance is the move cost of each tile from each char, inf when it is
+    not reachable, and attack marks the standable tiles each char can
+    attack after moving, both of shape (chars, x, y, z).
+    """
+
+    arrays: TileArrays
+    distance: np.ndarray
+    attack: np.ndarray
+
+    @property
+    def reach(self) -> np.ndarray:
+        return np.isfinite(self.distance)
+
+    def threat(self) -> np.ndarray:
+        """
+        Get the number of chars able to attack each tile, of shape
+        (x, y, z).
+        """
+        return self.attack.sum(0)
+
+    def tiles(self, grid: Grid, mask=None) -> List[TileRules]:
+        """
+        Get the tiles of grid marked in mask, the threatened ones by
+        default, to be highlighted on a board.
+        """
+        if mask is None:
+            mask = self.attack.any(0)
+        return self.arrays.tiles(grid, mask)
+
+
+def compute_threats(grid: Grid, chars, nb_steps: int = 2,
+                    attack_range: int = ATTACK_RANGE,
+                    **rules) -> ThreatMap:
+    """
+    Compute the tiles each of chars can reach in nb_steps and attack
+    within attack_range of the tiles reached.
+
+    Distances are those of `compute_reachable`, rules are its climbing
+    and dropping keyword arguments. Attacks cover the standable tiles
+    at a line distance up to attack_range, whatever the walls and the
+    levels in between; `pg_iso.line_of_sight.LineOfSight` tells which of
+    them are actually visible.
+    """
+    arrays = TileArrays(grid)
+    distance = np.full((len(chars),) + arrays.shape, np.inf)
+    for number, char in enumerate(chars):
+        distance[(number,) + arrays.index(char.x, char.y, char.z)] = 0
+
+    moves = list(arrays.moves(**rules))
+    while True:
+        relaxed = distance
+        for dx, dy, dz, allowed, cost in moves:
+            steps = np.where(allowed, distance + cost, np.inf)
+            relaxed = np.minimum(
+                relaxed, _shift(steps, -dx, -dy, -dz, np.inf))
+        relaxed[relaxed > nb_steps] = np.inf
+        if np.array_equal(relaxed, distance):
+            break
+        distance = relaxed
+
+    # Columns within attack_range of a reached tile, the line distance
+    # being the largest of the x and y distances.
+    columns = np.isfinite(distance).any(-1, keepdims=True)
+    for dx, dy in ((1, 0), (0, 1)):
+        covered = columns.copy()
+        for delta in range(1, attack_range + 1):
+            covered |= _shift(columns, delta * dx, delta * dy, 0, False)
+            covered |= _shift(columns, -delta * dx, -delta * dy, 0, False)
+        columns = covered
+    attack = columns & arrays.standable
+
+    return ThreatMap(arrays, distance, attack)
@@ -0,0 +1,107 @@
+import unittest
+from textwrap import dedent
+
+from pg_iso.ai import Planner, Snapshot, choose, evaluate
+from pg_iso.events import ActionPlanned, Event
+from pg_iso.model import Character, Grid
+from pg_iso.states import StateContext, ViewState
+
+
+LEVEL = dedent("""
+wwwww
+wwwww
+wbwww
+wwwww
+""")
+
+
+def make_grid():
+    grid = Grid.from_level(LEVEL)
+    char = Character()
+    target = Character()
+    grid.place_char(char, 0, 0, 0)
+    grid.place_char(target, 4, 3, 0)
+    return grid, char, target
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def test_round_trip(self):
+        grid, _, _ = make_grid()
+        snapshot = Snapshot.from_grid(grid)
+        copy = snapshot.to_grid()
+        self.assertEqual(snapshot, Snapshot.from_grid(copy))
+        self.assertTrue(copy.get_element(1, 2, 0).wall_nw)
+        self.assertIsNotNone(copy.get_element(4, 3, 0).char)
+
+
+class TestEvaluate(unittest.TestCase):
+
+    def test_prefer_visible_and_close(self):
+        grid, char, target = make_grid()
+        snapshot = Snapshot.from_grid(grid)
+        actions = evaluate(snapshot, (0, 0, 0), ((4, 3, 0),),
+                           [((0, 0, 0), 0), ((1, 0, 0), 1), ((2, 0, 0), 2)])
+        # (1, 0) and (2, 0) are 3 steps away, (1, 0) costs less.
+        best = choose(actions)
+        self.assertEqual((1, 0, 0), best.move_to)
+        self.assertEqual((4, 3, 0), best.target)
+
+
+class TestPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.actions = []
+        Event.add_trigger(self.actions.append, ActionPlanned)
+
+    def tearDown(self):
+        Event._triggers[ActionPlanned].remove(self.actions.append)
+
+    def test_deliver_on_poll(self):
+        grid, char, target = make_grid()
+        planner = Planner(workers=0)
+        planner.plan(grid, char, [target])
+        self.assertFalse(self.actions)
+        self.assertTrue(planner.busy)
+        planner.poll()
+        self.assertFalse(planner.busy)
+        self.assertEqual(1, len(self.actions))
+        self.assertIs(char, self.actions[0].char)
+
+    def test_replan_changed_board(self):
+        grid, char, target = make_grid()
+        planner = Planner(workers=0)
+        planner.plan(grid, char, [target])
+        grid.move_char(target, 4, 0, 0)
+        planner.poll()
+        self.assertFalse(self.actions)
+        planner.poll()
+        self.assertEqual((4, 0, 0), self.actions[0].action.target)
+
+    def test_pool_same_as_single_process(self):
+        grid, char, target = make_grid()
+        single = Planner(workers=0)
+        pool = Planner(workers=2)
+        try:
+            single.plan(grid, char, [target], nb_steps=3)
+            pool.plan(grid, char, [target], nb_steps=3)
+            single.poll()
+            while pool.busy:
+                pool.poll()
+        finally:
+            pool.shutdown()
+        self.assertEqual(self.actions[0].action, self.actions[1].action)
+
+    def test_state_plays_action(self):
+        grid, char, target = make_grid()
+        ctx = StateContext(ViewState)
+        Event.add_trigger(ctx.on_action_planned, ActionPlanned)
+        try:
+            planner = Planner(workers=0)
+            planner.plan(grid, char, [target])
+            planner.poll()
+        finally:
+            Event._triggers[ActionPlanned].remove(ctx.on_action_planned)
+        self.assertEqual(self.actions[0].action.move_to,
+                         (char.x, char.y, char.z))
+        self.assertIs(char, grid.get_element(char.x, char.y, char.z).char)
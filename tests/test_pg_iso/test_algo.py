@@ -1,5 +1,9 @@
 import unittest
-from pg_iso.algo import compute_path
+from fractions import Fraction
+from math import floor
+
+from pg_iso.algo import (LINE_CACHE, compute_line, compute_lines, compute_path,
+                         np)
 
 
 class TestComputePathToXY(unittest.TestCase):
@@ -104,3 +108,101 @@ class TestComputePath(unittest.TestCase):
         result = tuple(compute_path(4, 4, 4, 4))
         expected = ()
         self.assertEqual(expected, result)
+
+
+def float_path(x1, y1, x2, y2):
+    """
+    Cells of the former compute_path, accumulating a float step.
+    """
+    dist_x = abs(x2 - x1)
+    dist_y = abs(y2 - y1)
+    cells = []
+    if dist_x > dist_y:
+        step_y = (dist_y if y1 <= y2 else -dist_y) / dist_x
+        step_x = 1 if x1 <= x2 else -1
+        y = y1
+        for x in range(x1 + step_x, x2 + step_x, step_x):
+            y += step_y
+            cells.append((x, floor(y + 0.5)))
+    elif dist_y:
+        step_x = (dist_x if x1 < x2 else -dist_x) / dist_y
+        step_y = 1 if y1 <= y2 else -1
+        x = x1
+        for y in range(y1 + step_y, y2 + step_y, step_y):
+            x += step_x
+            cells.append((floor(x + 0.5), y))
+    return cells
+
+
+class TestComputeLine(unittest.TestCase):
+
+    def test_same_cells_as_float_rounding(self):
+        for x2 in range(-9, 10):
+            for y2 in range(-9, 10):
+                major = max(abs(x2), abs(y2))
+                minor = min(abs(x2), abs(y2))
+                if any(2 * k * minor % (2 * major) == major
+                       for k in range(1, major + 1)):
+                    # Exact half steps are where the float version drifts.
+                    continue
+                self.assertEqual(float_path(1, 2, 1 + x2, 2 + y2),
+                                 compute_line(1, 2, 1 + x2, 2 + y2))
+
+    def test_long_lines(self):
+        for x2, y2 in ((-40, -37), (40, 37), (-40, 37), (-37, -40)):
+            major = max(abs(x2), abs(y2))
+            expected = [
+                (k * (1 if x2 > 0 else -1),
+                 floor(Fraction(k * y2, major) + Fraction(1, 2)))
+                if abs(x2) > abs(y2) else
+                (floor(Fraction(k * x2, major) + Fraction(1, 2)),
+                 k * (1 if y2 > 0 else -1))
+                for k in range(1, major + 1)]
+            self.assertEqual(expected, compute_line(0, 0, x2, y2))
+
+        # The float version gave (-20, -19) and (-19, -20).
+        self.assertEqual((-20, -18), compute_line(0, 0, -40, -37)[19])
+        self.assertEqual((-18, -20), compute_line(0, 0, -37, -40)[19])
+
+    def test_half_is_rounded_up(self):
+        self.assertEqual([(-1, 0), (-2, -1), (-3, -1), (-4, -2)],
+                         compute_line(0, 0, -4, -2))
+        self.assertEqual([(-1, 1), (-2, 1), (-3, 2), (-4, 2)],
+                         compute_line(0, 0, -4, 2))
+
+
+class TestLineCache(unittest.TestCase):
+
+    def setUp(self):
+        LINE_CACHE.clear()
+
+    def test_translated(self):
+        for x1, y1 in ((0, 0), (3, -2), (-7, 5)):
+            for x2 in range(x1 - 6, x1 + 7):
+                for y2 in range(y1 - 6, y1 + 7):
+                    self.assertEqual(list(compute_path(x1, y1, x2, y2)),
+                                     compute_line(x1, y1, x2, y2))
+        self.assertEqual({'hits': 2 * 13 * 13, 'misses': 13 * 13,
+                          'size': 13 * 13, 'maxsize': LINE_CACHE.maxsize},
+                         LINE_CACHE.info())
+
+
+class TestComputeLines(unittest.TestCase):
+
+    targets = [(x, y) for x in range(-5, 6) for y in range(-5, 6)]
+
+    def test_compute_lines(self):
+        result = compute_lines(1, 2, self.targets)
+        expected = [compute_line(1, 2, *target) for target in self.targets]
+        self.assertEqual(expected, result)
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_compute_lines_from_array(self):
+        result = compute_lines(1, 2, np.array(self.targets))
+        expected = [compute_line(1, 2, *target) for target in self.targets]
+        self.assertEqual(expected, [list(map(tuple, line.tolist()))
+                                    for line in result])
+
+    @unittest.skipIf(np is None, 'NumPy is not installed')
+    def test_compute_lines_from_empty_array(self):
+        self.assertEqual([], compute_lines(1, 2, np.empty((0, 2), int)))
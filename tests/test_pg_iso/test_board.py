@@ -0,0 +1,647 @@
+import os
+import unittest
+from math import hypot
+from textwrap import dedent
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from pg_iso.board import (Board, BoardBox, Char, FlyweightBox, HoverTracker,
+                          Prerenderer)
+from pg_iso.level import Level
+from pg_iso.model import tile_mask
+from pg_iso.profiler import PROFILER
+
+
+LEVEL = dedent("""
+yxbw
+wwyw
+wxxw
+""")
+
+
+def make_board(level=LEVEL):
+
+    def box(x, y, z):
+        return BoardBox(x, y, z, (23, 76, 96))
+
+    return Board(level, {'b': box, 'x': box, 'y': box, 'w': box})
+
+
+class TestGetElement(unittest.TestCase):
+
+    def assert_index_matches_group(self, board):
+        for element in board.group:
+            self.assertIs(
+                element,
+                board.get_element(element.x, element.y, element.z))
+
+    def test_get_element(self):
+        board = make_board()
+        element = board.get_element(2, 1, 0)
+        self.assertEqual((2, 1, 0), (element.x, element.y, element.z))
+
+    def test_get_element_not_found(self):
+        board = make_board()
+        self.assertIsNone(board.get_element(4, 0, 0))
+        self.assertIsNone(board.get_element(0, 0, 1))
+
+    def test_get_element_after_rotate(self):
+        board = make_board()
+        for _ in range(4):
+            board.rotate()
+            self.assert_index_matches_group(board)
+
+    def test_get_element_after_place_item(self):
+        board = make_board()
+        item = BoardBox(0, 0, 0, (23, 76, 96))
+        board.place_item(item, 1, 1, 1)
+        self.assertIs(item, board.get_element(1, 1, 1))
+        board.place_item(item, 2, 2, 1)
+        self.assertIsNone(board.get_element(1, 1, 1))
+        self.assertIs(item, board.get_element(2, 2, 1))
+
+
+class TestPick(unittest.TestCase):
+
+    @staticmethod
+    def brute_force_pick(board, point):
+        point = (point[0] - board.rect.x, point[1] - board.rect.y)
+        cases = sorted(
+            (case for case in board.group if case.rect.collidepoint(point)),
+            key=lambda case: (-case.x, case.y, case.z))
+        if cases:
+            return min(
+                cases,
+                key=lambda case: hypot(case.center[0] - point[0],
+                                       case.center[1] - point[1]))
+
+    def assert_pick_matches_brute_force(self, board):
+        for px in range(-20, board.rect.width + 20, 7):
+            for py in range(-20, board.rect.height + 20, 7):
+                self.assertIs(self.brute_force_pick(board, (px, py)),
+                              board.pick((px, py)))
+
+    def test_pick(self):
+        board = make_board(LEVEL + '\nwww\nwww\n')
+        board.rect.topleft = (13, -8)
+        self.assert_pick_matches_brute_force(board)
+
+    def test_pick_after_rotate(self):
+        board = make_board(LEVEL + '\nwww\nwww\n')
+        for _ in range(4):
+            board.rotate()
+            self.assert_pick_matches_brute_force(board)
+
+    def test_pick_outside_board(self):
+        board = make_board()
+        self.assertIsNone(board.pick((-500, -500)))
+
+
+class TestTileCache(unittest.TestCase):
+
+    def test_same_state_share_image(self):
+        first = BoardBox(0, 0, 0, (23, 76, 96))
+        second = BoardBox(1, 0, 0, (23, 76, 96))
+        first.update()
+        second.update()
+        self.assertIs(first.image, second.image)
+
+        misses = BoardBox.tile_cache.misses
+        first.char = second.char = Char(0, 0, 0, (212, 23, 132))
+        first.update()
+        self.assertIsNot(first.image, second.image)
+        second.update()
+        self.assertIs(first.image, second.image)
+        self.assertEqual(misses + 1, BoardBox.tile_cache.misses)
+
+    def test_walls_are_part_of_state(self):
+        first = BoardBox(0, 0, 0, (23, 76, 96))
+        second = BoardBox(1, 0, 0, (23, 76, 96))
+        second.wall_ne = True
+        first.update()
+        second.update()
+        self.assertIsNot(first.image, second.image)
+
+
+class TestRotate(unittest.TestCase):
+
+    def test_rotate(self):
+        board = make_board(LEVEL + '\nwww\nwww\n')
+        for _ in range(4):
+            offset = max(item.y for item in board.group)
+            expected = {item: (offset - item.y, item.x, item.z)
+                        for item in board.group}
+            board.rotate()
+            self.assertEqual(
+                expected,
+                {item: (item.x, item.y, item.z) for item in board.group})
+            self.assertEqual(
+                sorted(board.group,
+                       key=lambda item: (-item.x, item.y, item.z)),
+                list(board.group))
+
+    def test_rotate_four_times(self):
+        board = make_board()
+        expected = {item: (item.x, item.y, item.z, item.rect.topleft)
+                    for item in board.group}
+        for _ in range(4):
+            board.rotate()
+        self.assertEqual(
+            expected,
+            {item: (item.x, item.y, item.z, item.rect.topleft)
+             for item in board.group})
+
+    def test_rotate_reverse(self):
+        board = make_board()
+        board.get_element(1, 1, 0).wall_ne = True
+        board.masks.update(board.get_element(1, 1, 0))
+        state = [(item, item.x, item.y, item.z, item.rect.topleft,
+                  item.wall_nw, item.wall_ne, item.wall_sw, item.wall_se)
+                 for item in board.group]
+        board.rotate(reverse=True)
+        self.assertEqual(3, board.orientation)
+        board.rotate(reverse=True)
+        board.rotate()
+        board.rotate()
+        self.assertEqual(
+            state,
+            [(item, item.x, item.y, item.z, item.rect.topleft,
+              item.wall_nw, item.wall_ne, item.wall_sw, item.wall_se)
+             for item in board.group])
+        for item in board.group:
+            self.assertEqual(tile_mask(item),
+                             board.masks.get(item.x, item.y, item.z))
+
+    def test_rotate_placed_item(self):
+        board = make_board()
+        item = BoardBox(0, 0, 0, (23, 76, 96))
+        board.place_item(item, 1, 1, 1)
+        board.rotate()
+        self.assertIn(item, board.group)
+        self.assertEqual((1, 1, 1), (item.x, item.y, item.z))
+
+    def test_rotate_char(self):
+        board = make_board()
+        char = Char(0, 0, 0, (212, 23, 132))
+        board.place_char(char, 2, 1, 0)
+        board.rotate()
+        box = board.get_element(char.x, char.y, char.z)
+        self.assertIs(char, box.char)
+
+
+class TestComputeImageSize(unittest.TestCase):
+
+    @staticmethod
+    def four_rotation_scan(positions):
+        rects = []
+        for _ in range(4):
+            offset = max(pos[1] for pos, _ in positions)
+            for pos, _ in positions:
+                pos[0], pos[1] = offset - pos[1], pos[0]
+                rects.append(BoardBox.create_and_place_rect(*pos))
+        bounds = rects[0].unionall(rects[1:])
+        return ((max(0, bounds.right) - min(0, bounds.left),
+                 max(0, bounds.bottom) - min(0, bounds.top)),
+                bounds.top)
+
+    def test_compute_image_size(self):
+        for level in (LEVEL, LEVEL + '\nwww\nwww\n', 'w\n\nww\n\nwww'):
+            with self.subTest(level=level):
+                board = make_board(level)
+                self.assertEqual(
+                    self.four_rotation_scan(Board.read_level(level)),
+                    (board.rect.size, board.offset_y))
+
+
+class TestOrientationRects(unittest.TestCase):
+
+    def assert_orientation_rects(self, board):
+        for _ in range(4):
+            rects = [item.rect for item in board.group]
+            self.assertEqual(rects[0].unionall(rects[1:]),
+                             board.orientation_rects[board.orientation])
+            board.rotate()
+
+    def test_orientation_rects(self):
+        board = make_board(LEVEL + '\nwww\nwww\n')
+        self.assert_orientation_rects(board)
+
+    def test_orientation_rects_after_place_item(self):
+        board = make_board()
+        board.place_item(BoardBox(0, 0, 0, (23, 76, 96)), 1, 1, 3)
+        self.assert_orientation_rects(board)
+        board.place_item(BoardBox(0, 0, 0, (23, 76, 96)), 6, 5, 0)
+        self.assert_orientation_rects(board)
+
+    def test_orientation_rects_after_place_cubes(self):
+        board = make_board('wwwwwwwww\nwwwwwwwww\nwwwwwwwww\n')
+        board.rotate()
+        board.place_item(BoardBox(0, 0, 0, (23, 76, 96)), 12, 1, 0)
+        board._place_cubes()
+        self.assertEqual(0, board.orientation)
+        self.assert_orientation_rects(board)
+
+
+class TestPlaceItem(unittest.TestCase):
+
+    def assert_sorted(self, board):
+        self.assertEqual(
+            sorted(board.group,
+                   key=lambda item: (-item.x, item.y, item.z)),
+            list(board.group))
+
+    def assert_rotate_like_full_relayout(self, board):
+        for _ in range(4):
+            offset = max(item.y for item in board.group)
+            expected = {item: (offset - item.y, item.x, item.z)
+                        for item in board.group}
+            board.rotate()
+            self.assertEqual(
+                expected,
+                {item: (item.x, item.y, item.z) for item in board.group})
+            self.assert_sorted(board)
+            for item in board.group:
+                self.assertIs(
+                    item, board.get_element(item.x, item.y, item.z))
+
+    def assert_rotate_rigid(self, board):
+        """
+        Check that each rotation turns all items around the same center,
+        so neighbours stay neighbours, and that four go back to start.
+        """
+        start = {item: (item.x, item.y, item.z) for item in board.group}
+        for _ in range(4):
+            before = {item: (item.x, item.y, item.z) for item in board.group}
+            board.rotate()
+            self.assertEqual(
+                1, len({(item.x + y, item.y - x, item.z - z)
+                        for item, (x, y, z) in before.items()}))
+            for item in board.group:
+                self.assertEqual(tile_mask(item),
+                                 board.masks.get(item.x, item.y, item.z))
+        self.assertEqual(
+            start, {item: (item.x, item.y, item.z) for item in board.group})
+
+    def test_place_item_on_offset_level(self):
+        level = Level.from_text('ww\nww\n')
+        level.coords[:, :2] += 2
+        board = make_board(level)
+        board.rotate()
+        under = board.group[0]
+        item = BoardBox(0, 0, 0, (23, 76, 96))
+        board.place_item(item, under.x, under.y, 1)
+        for _ in range(3):
+            board.rotate()
+        self.assertIs(item, board.get_element(under.x, under.y, 1))
+        self.assert_rotate_rigid(board)
+
+    def test_place_item_after_rebuild(self):
+        board = make_board('ww\nww\n')
+        board.place_item(BoardBox(0, 0, 0, (23, 76, 96)), 2, -1, 0)
+        board.place_item(BoardBox(0, 0, 0, (23, 76, 96)), 2, 3, 0)
+        board.rotate()
+        board.rotate()
+        under = board.group[0]
+        item = BoardBox(0, 0, 0, (23, 76, 96))
+        board.place_item(item, under.x, under.y, 1)
+        self.assert_rotate_rigid(board)
+        board.rotate()
+        self.assertIs(item, board.get_element(under.x, under.y, 1))
+        board.remove_item(item)
+        self.assert_rotate_rigid(board)
+        board.place_item(item, under.x, under.y, 1)
+        self.assert_rotate_rigid(board)
+
+    def test_place_item_keeps_order(self):
+        board = make_board()
+        item = BoardBox(0, 0, 0, (23, 76, 96))
+        board.place_item(item, 2, 1, 1)
+        self.assert_sorted(board)
+        self.assert_rotate_like_full_relayout(board)
+
+    def test_place_item_outside_board(self):
+        board = make_board()
+        item = BoardBox(0, 0, 0, (23, 76, 96))
+        board.place_item(item, 6, 5, 0)
+        self.assert_sorted(board)
+        self.assert_rotate_like_full_relayout(board)
+
+    def test_move_item(self):
+        board = make_board()
+        item = BoardBox(0, 0, 0, (23, 76, 96))
+        board.place_item(item, 6, 5, 0)
+        board.place_item(item, 1, 1, 1)
+        self.assertEqual(1, sum(1 for other in board.group
+                                if other is item))
+        self.assertIsNone(board.get_element(6, 5, 0))
+        self.assert_sorted(board)
+        self.assert_rotate_like_full_relayout(board)
+
+    def test_remove_item(self):
+        board = make_board()
+        item = board.get_element(1, 1, 0)
+        board.remove_item(item)
+        self.assertNotIn(item, board.group)
+        self.assertIsNone(board.get_element(1, 1, 0))
+        self.assert_rotate_like_full_relayout(board)
+
+    def test_remove_bounding_item(self):
+        board = make_board()
+        item = BoardBox(0, 0, 0, (23, 76, 96))
+        board.place_item(item, 6, 5, 0)
+        board.remove_item(item)
+        self.assert_rotate_like_full_relayout(board)
+
+
+class SmallChunkBoard(Board):
+    chunk_size = 100
+    chunk_keep_distance = 0
+
+
+class TestDraw(unittest.TestCase):
+
+    def setUp(self):
+        self.board = SmallChunkBoard(
+            LEVEL + '\nwww\nwww\n',
+            {key: lambda x, y, z: BoardBox(x, y, z, (23, 76, 96))
+             for key in 'bxyw'})
+        for item in self.board.group:
+            item.update()
+
+    def reference(self, size):
+        expected = pygame.Surface(size)
+        expected.fill(self.board.color)
+        for item in self.board.group:
+            expected.blit(item.image, item.rect.move(self.board.rect.topleft))
+        return pygame.image.tobytes(expected, 'RGB')
+
+    def draw(self, size):
+        surface = pygame.Surface(size)
+        surface.fill(self.board.color)
+        self.board.draw(surface)
+        return pygame.image.tobytes(surface, 'RGB')
+
+    def test_draw(self):
+        size = self.board.rect.size
+        self.assertEqual(self.reference(size), self.draw(size))
+
+    def test_draw_board_bounds(self):
+        self.board.rect.topleft = (30, 20)
+        size = (self.board.rect.right + 40, self.board.rect.bottom + 30)
+        expected = pygame.Surface(size)
+        expected.fill((255, 255, 255))
+        expected.fill(self.board.color, self.board.rect)
+        for item in self.board.group:
+            expected.blit(item.image, item.rect.move(self.board.rect.topleft))
+
+        surface = pygame.Surface(size)
+        surface.fill((255, 255, 255))
+        self.board.draw(surface)
+        self.assertEqual(pygame.image.tobytes(expected, 'RGB'),
+                         pygame.image.tobytes(surface, 'RGB'))
+
+    def test_draw_dirty_item(self):
+        size = self.board.rect.size
+        self.draw(size)
+        box = self.board.get_element(1, 1, 0)
+        box.wall_se = True
+        box.update()
+        self.assertEqual(self.reference(size), self.draw(size))
+
+    def test_draw_highlighted(self):
+        size = self.board.rect.size
+        self.draw(size)
+        self.board.set_highlighted([self.board.get_element(1, 1, 0),
+                                    self.board.get_element(2, 1, 0)])
+        self.assertEqual(self.reference(size), self.draw(size))
+        self.board.rotate()
+        self.assertEqual(self.reference(size), self.draw(size))
+        self.board.set_highlighted([self.board.get_element(2, 1, 0)])
+        self.assertEqual(self.reference(size), self.draw(size))
+
+    def test_draw_after_rotate(self):
+        size = self.board.rect.size
+        self.draw(size)
+        self.board.rotate()
+        self.assertEqual(self.reference(size), self.draw(size))
+
+    def test_free_far_chunks(self):
+        self.draw((150, 150))
+        allocated = [chunk for chunk in self.board._chunks.values()
+                     if chunk.surface is not None]
+        self.assertTrue(allocated)
+        self.assertLess(len(allocated), len(self.board._chunks))
+
+        self.board.rect.topleft = (-1000, -1000)
+        self.draw((150, 150))
+        self.assertFalse([chunk for chunk in self.board._chunks.values()
+                          if chunk.surface is not None])
+
+    def test_draw_changed_rects(self):
+        size = self.board.rect.size
+        surface = pygame.Surface(size)
+        surface.fill(self.board.color)
+        self.assertEqual([surface.get_rect()], self.board.draw(surface))
+        self.assertEqual([], self.board.draw(surface, full=False))
+
+        box = self.board.get_element(1, 1, 0)
+        self.board.set_highlighted([box])
+        rects = self.board.draw(surface, full=False)
+        self.assertTrue(rects)
+        self.assertEqual(box.rect, rects[0].unionall(rects))
+        self.assertEqual(self.reference(size),
+                         pygame.image.tobytes(surface, 'RGB'))
+
+
+class TestFlyweightDraw(TestDraw):
+
+    def setUp(self):
+        self.board = SmallChunkBoard(
+            LEVEL + '\nwww\nwww\n',
+            {key: lambda x, y, z: FlyweightBox(x, y, z, (23, 76, 96))
+             for key in 'bxyw'})
+        for item in self.board.group:
+            item.update()
+
+
+class TestFlyweight(unittest.TestCase):
+
+    def make_board(self):
+        return Board(LEVEL, {
+            key: lambda x, y, z: FlyweightBox(x, y, z, (23, 76, 96))
+            for key in 'bxyw'})
+
+    def test_slots(self):
+        box = FlyweightBox(0, 0, 0, (23, 76, 96))
+        self.assertFalse(hasattr(box, '__dict__'))
+        with self.assertRaises(AttributeError):
+            box.name = 'box'
+
+    def test_shared_images(self):
+        first = FlyweightBox(0, 0, 0, (23, 76, 96))
+        second = FlyweightBox(3, 2, 1, (23, 76, 96))
+        self.assertIs(first.image, second.image)
+        first.update()
+        second.update()
+        self.assertIs(first.image, second.image)
+        self.assertIs(Char(0, 0, 0, (212, 23, 132)).image,
+                      Char(1, 0, 0, (212, 23, 132)).image)
+
+    def test_rect(self):
+        box = FlyweightBox(0, 0, 0, (23, 76, 96))
+        box.place(2, 1, 1, -30)
+        self.assertEqual(BoardBox.create_and_place_rect(2, 1, 1, -30),
+                         box.rect)
+        self.assertEqual(BoardBox.depth(2, 1, 1), box.layer)
+
+    def test_get_element_after_rotate(self):
+        board = self.make_board()
+        for _ in range(4):
+            board.rotate()
+            for element in board.group:
+                self.assertIs(
+                    element,
+                    board.get_element(element.x, element.y, element.z))
+
+    def test_place_char(self):
+        board = self.make_board()
+        char = Char(0, 0, 0, (212, 23, 132))
+        board.place_char(char, 1, 1, 0)
+        board.move_char(char, 2, 1, 0)
+        self.assertIsNone(board.get_element(1, 1, 0).char)
+        self.assertIs(char, board.get_element(2, 1, 0).char)
+
+
+class TestHover(unittest.TestCase):
+
+    def setUp(self):
+        self.board = make_board()
+        self.tracker = HoverTracker(self.board)
+        self.point = self.board.get_element(1, 1, 0).center
+        self.point = (self.point[0], self.point[1] - 30)
+
+    def test_pick_only_on_change(self):
+        PROFILER.end_frame()
+        case = self.tracker.update(self.point)
+        self.assertIs(self.board.get_element(1, 1, 0), case)
+        self.assertIs(case, self.tracker.update(self.point))
+        self.assertEqual(1, PROFILER.end_frame()['counters']['picks'])
+
+        self.board.rect.x += 120
+        self.assertIsNot(case, self.tracker.update(self.point))
+        self.board.rotate()
+        self.tracker.update(self.point)
+        self.assertEqual(2, PROFILER.end_frame()['counters']['picks'])
+
+    def test_same_tile_is_noop(self):
+        case = self.tracker.update(self.point)
+        case.dirty = 0
+        self.board.cursor.dirty = 0
+        self.tracker.update((self.point[0] + 1, self.point[1]))
+        self.assertEqual(0, case.dirty)
+        self.assertEqual(0, self.board.cursor.dirty)
+
+    def test_cursor_not_in_tile(self):
+        case = self.tracker.update(self.point)
+        self.assertTrue(case.cursor)
+        other = self.board.get_element(2, 1, 0)
+        self.assertIs(case.image, other.image)
+
+    def test_draw_cursor(self):
+        board = SmallChunkBoard(
+            LEVEL, {key: lambda x, y, z: BoardBox(x, y, z, (23, 76, 96))
+                    for key in 'bxyw'})
+        size = board.rect.size
+        surface = pygame.Surface(size)
+        surface.fill(board.color)
+        board.draw(surface)
+        tracker = HoverTracker(board)
+        for point in (self.point, (self.point[0] + 120, self.point[1])):
+            case = tracker.update(point)
+            board.draw(surface, full=False)
+
+            expected = pygame.Surface(size)
+            expected.fill(board.color)
+            for item in board.group:
+                expected.blit(item.image, item.rect)
+                if item is case:
+                    expected.blit(board.cursor.image, board.cursor.rect)
+            self.assertEqual(pygame.image.tobytes(expected, 'RGB'),
+                             pygame.image.tobytes(surface, 'RGB'))
+
+
+class TestSetHighlighted(unittest.TestCase):
+
+    def test_apply_difference(self):
+        board = make_board()
+        first = board.get_element(0, 0, 0)
+        second = board.get_element(1, 0, 0)
+        third = board.get_element(2, 0, 0)
+        board.set_highlighted([first, second])
+        self.assertEqual({first, second}, board.highlighted)
+
+        PROFILER.end_frame()
+        board.set_highlighted([second, third])
+        self.assertEqual({second, third}, board.highlighted)
+        self.assertFalse(first.highlighted)
+        self.assertTrue(third.highlighted)
+        self.assertEqual(2, PROFILER.end_frame()['counters']['tiles_updated'])
+
+    def test_tint_is_cached(self):
+        board = make_board()
+        first = board.get_element(0, 0, 0)
+        second = board.get_element(1, 0, 0)
+        board.set_highlighted([first])
+        misses = BoardBox.tile_cache.misses
+        board.set_highlighted([second])
+        board.set_highlighted([first, second])
+        self.assertEqual(misses, BoardBox.tile_cache.misses)
+        self.assertIs(first.image, second.image)
+
+    def test_remove_item(self):
+        board = make_board()
+        item = board.get_element(1, 1, 0)
+        board.set_highlighted([item])
+        board.remove_item(item)
+        self.assertNotIn(item, board.highlighted)
+
+
+class TestPrerenderer(unittest.TestCase):
+
+    def setUp(self):
+        from pg_iso.__main__ import get_board
+
+        self.board = get_board(LEVEL + '\nwww\nwww\n', lazy=True)
+        self.view = pygame.Rect(0, 0, 120, 60)
+
+    def test_nearest_first(self):
+        prerenderer = Prerenderer(self.board, self.view)
+        blank = BoardBox.blank_image()
+        self.assertEqual(1, prerenderer.step(0))
+        updated = [item for item in self.board.group
+                   if item.image is not blank]
+        self.assertEqual(1, len(updated))
+        distance = hypot(updated[0].center[0] - self.view.centerx,
+                         updated[0].center[1] - self.view.centery)
+        for item in self.board.group:
+            self.assertGreaterEqual(
+                hypot(item.center[0] - self.view.centerx,
+                      item.center[1] - self.view.centery), distance)
+
+    def test_draw(self):
+        prerenderer = Prerenderer(self.board, self.view)
+        size = self.board.rect.size
+        surface = pygame.Surface(size)
+        self.board.draw(surface)
+        while prerenderer:
+            prerenderer.step(0.001)
+            self.board.draw(surface, full=False)
+
+        expected = pygame.Surface(size)
+        expected.fill(self.board.color)
+        for item in self.board.group:
+            expected.blit(item.image, item.rect)
+        self.assertEqual(pygame.image.tobytes(expected, 'RGB'),
+                         pygame.image.tobytes(surface, 'RGB'))
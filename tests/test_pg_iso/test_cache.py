@@ -0,0 +1,31 @@
+import unittest
+
+from pg_iso.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_get(self):
+        cache = LRUCache(maxsize=2)
+        self.assertEqual('a', cache.get(1, lambda: 'a'))
+        self.assertEqual('a', cache.get(1, lambda: 'b'))
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 2},
+                         cache.info())
+
+    def test_evict_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.get(1, lambda: 'a')
+        cache.get(2, lambda: 'b')
+        cache.get(1, lambda: 'a')
+        cache.get(3, lambda: 'c')
+        self.assertIn(1, cache)
+        self.assertNotIn(2, cache)
+        self.assertIn(3, cache)
+        self.assertEqual(2, len(cache))
+
+    def test_clear(self):
+        cache = LRUCache()
+        cache.get(1, lambda: 'a')
+        cache.clear()
+        self.assertEqual({'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 128},
+                         cache.info())
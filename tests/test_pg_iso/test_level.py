@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from textwrap import dedent
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from pg_iso.board import Board, BoardBox
+from pg_iso.level import Level
+
+
+LEVELS = (
+    '',
+    'ab',
+    'ab\n',
+    dedent("""
+    yxbw
+    wwyw
+
+    wxx
+    ww
+
+    """),
+    'ab\r\ncd\n\n\nef',
+)
+
+
+class TestLevel(unittest.TestCase):
+
+    def test_from_text(self):
+        for text in LEVELS:
+            with self.subTest(text=text):
+                self.assertEqual(
+                    [(tuple(position), char)
+                     for position, char in Board.read_level(text)],
+                    list(Level.from_text(text)))
+
+    def test_save_and_load(self):
+        level = Level.from_text(LEVELS[3])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'level.pgl')
+            level.save(path)
+            for mmap in (True, False):
+                self.assertEqual(list(level),
+                                 list(Level.load(path, mmap=mmap)))
+
+    def test_load_invalid_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'level.pgl')
+            with open(path, 'wb') as file:
+                file.write(b'not a level')
+            with self.assertRaises(ValueError):
+                Level.load(path)
+
+    def test_load_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            level = Level.load_cached(LEVELS[3], directory)
+            self.assertEqual(1, len(os.listdir(directory)))
+            cached = Level.load_cached(LEVELS[3], directory)
+            self.assertEqual(list(level), list(cached))
+            self.assertEqual(1, len(os.listdir(directory)))
+
+    def test_board_from_level(self):
+
+        def box(x, y, z):
+            return BoardBox(x, y, z, (23, 76, 96))
+
+        items_builder = {key: box for key in 'bwxy'}
+        from_text = Board(LEVELS[3], items_builder)
+        from_level = Board(Level.from_text(LEVELS[3]), items_builder)
+        self.assertEqual(from_text.rect, from_level.rect)
+        self.assertEqual(
+            [(item.x, item.y, item.z) for item in from_text.group],
+            [(item.x, item.y, item.z) for item in from_level.group])
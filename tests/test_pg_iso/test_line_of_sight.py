@@ -0,0 +1,126 @@
+import os
+import unittest
+from textwrap import dedent
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from pg_iso.board import Board, BoardBox, Char
+from pg_iso.line_of_sight import LineOfSight
+from pg_iso.model import Grid, Tile
+
+
+def make_board(level):
+
+    def ground(x, y, z):
+        return BoardBox(x, y, z, (23, 76, 96))
+
+    def ground_with_y_wall(x, y, z):
+        box = BoardBox(x, y, z, (23, 76, 96))
+        box.wall_ne = True
+        return box
+
+    return Board(level, {'w': ground, 'y': ground_with_y_wall})
+
+
+class TestLineOfSight(unittest.TestCase):
+
+    def test_visible(self):
+        board = make_board(dedent("""\
+        wwww
+        wwww
+        """))
+        sight = LineOfSight(board).compute(0, 0, 3, 1, 0)
+        self.assertTrue(sight.visible)
+        self.assertEqual([(1, 0), (2, 1), (3, 1)],
+                         [(box.x, box.y) for box in sight.boxes])
+
+    def test_wall_blocks(self):
+        board = make_board(dedent("""\
+        wyww
+        """))
+        sight = LineOfSight(board).compute(0, 0, 3, 0, 0)
+        self.assertFalse(sight.visible)
+        self.assertEqual([(1, 0)], [(box.x, box.y) for box in sight.boxes])
+
+    def test_diagonal_step_around_wall(self):
+        board = make_board(dedent("""\
+        yw
+        ww
+        """))
+        self.assertTrue(LineOfSight(board).compute(0, 0, 1, 1, 0))
+
+    def test_diagonal_step_between_walls(self):
+        board = make_board(dedent("""\
+        yw
+        yw
+        """))
+        self.assertFalse(LineOfSight(board).compute(0, 0, 1, 1, 0))
+
+    def test_char_blocks(self):
+        board = make_board(dedent("""\
+        wwww
+        """))
+        board.place_char(Char(0, 0, 0, (212, 23, 132)), 2, 0, 0)
+        line_of_sight = LineOfSight(board)
+        self.assertFalse(line_of_sight.compute(0, 0, 3, 0, 0))
+        self.assertTrue(line_of_sight.compute(0, 0, 2, 0, 0))
+
+    def test_cache(self):
+        board = make_board(dedent("""\
+        wwww
+        """))
+        line_of_sight = LineOfSight(board)
+        sight = line_of_sight.compute(0, 0, 3, 0, 0)
+        self.assertIs(sight, line_of_sight.compute(0, 0, 3, 0, 0))
+
+        char = Char(0, 0, 0, (212, 23, 132))
+        board.place_char(char, 2, 0, 0)
+        self.assertFalse(line_of_sight.compute(0, 0, 3, 0, 0))
+
+        board.move_char(char, 3, 0, 0)
+        self.assertTrue(line_of_sight.compute(0, 0, 3, 0, 0))
+
+    def test_cache_after_place_cubes(self):
+        board = make_board(dedent("""\
+        wwww
+        """))
+        line_of_sight = LineOfSight(board)
+        sight = line_of_sight.compute(0, 0, 3, 0, 0)
+        board._place_cubes()
+        self.assertEqual([board.get_element(x, 0, 0) for x in (1, 2, 3)],
+                         line_of_sight.compute(0, 0, 3, 0, 0).boxes)
+        self.assertIsNot(sight, line_of_sight.compute(0, 0, 3, 0, 0))
+
+    def test_cache_after_remove_item(self):
+        board = make_board(dedent("""\
+        wwww
+        """))
+        line_of_sight = LineOfSight(board)
+        line_of_sight.compute(0, 0, 3, 0, 0)
+        board.remove_item(board.get_element(1, 0, 0))
+        self.assertEqual([(2, 0), (3, 0)],
+                         [(box.x, box.y) for box in
+                          line_of_sight.compute(0, 0, 3, 0, 0).boxes])
+
+        board.place_item(BoardBox(0, 0, 0, (23, 76, 96)), 1, 0, 0)
+        self.assertEqual([(1, 0), (2, 0), (3, 0)],
+                         [(box.x, box.y) for box in
+                          line_of_sight.compute(0, 0, 3, 0, 0).boxes])
+
+
+class TestLevels(unittest.TestCase):
+
+    def make_grid(self, *raised):
+        tiles = [Tile(x, 0, 0) for x in range(5)]
+        tiles.extend(Tile(x, 0, 1) for x in raised)
+        return Grid(tiles)
+
+    def test_higher_ground_blocks(self):
+        line_of_sight = LineOfSight(self.make_grid(2))
+        self.assertFalse(line_of_sight.compute(0, 0, 4, 0, 0))
+
+    def test_see_higher_target(self):
+        sight = LineOfSight(self.make_grid(4)).compute(0, 0, 4, 0, 0, 1)
+        self.assertTrue(sight)
+        self.assertEqual((4, 0, 1), (sight.boxes[-1].x, sight.boxes[-1].y,
+                                     sight.boxes[-1].z))
@@ -0,0 +1,346 @@
+import os
+import subprocess
+import sys
+import unittest
+from textwrap import dedent
+
+from pg_iso.events import CharSelected, ItemSelected, KeyEvent
+from pg_iso.model import (OCCUPIED, CellMasks, Character, Grid, StateLog,
+                          Tile, tile_mask)
+from pg_iso.reachability import DIRECTIONS, can_move, compute_area
+from pg_iso.states import AttackState, MoveState, StateContext, ViewState
+
+
+LEVEL = dedent("""
+yxbw
+wwyw
+wxxw
+""")
+
+
+class TestImport(unittest.TestCase):
+
+    def test_without_pygame(self):
+        code = dedent("""\
+        import sys
+        sys.modules['pygame'] = None
+        import pg_iso.line_of_sight, pg_iso.model, pg_iso.states
+        assert 'pg_iso.board' not in sys.modules
+        """)
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        subprocess.run([sys.executable, '-c', code], cwd=root, check=True)
+
+
+class TestGrid(unittest.TestCase):
+
+    def test_from_level(self):
+        grid = Grid.from_level(LEVEL)
+        self.assertEqual(12, len(grid))
+        box = grid.get_element(2, 0, 0)
+        self.assertEqual((True, True), (box.wall_nw, box.wall_ne))
+        self.assertIsNone(grid.get_element(4, 0, 0))
+
+    def test_slots(self):
+        self.assertFalse(hasattr(Tile(0, 0, 0), '__dict__'))
+
+    def test_move_char(self):
+        grid = Grid.from_level(LEVEL)
+        char = Character()
+        grid.place_char(char, 0, 0, 0)
+        grid.move_char(char, 1, 1, 0)
+        self.assertIsNone(grid.get_element(0, 0, 0).char)
+        self.assertIs(char, grid.get_element(1, 1, 0).char)
+        self.assertEqual(3, grid.version)
+
+    def test_rotate_like_board(self):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        from pg_iso.__main__ import get_board
+
+        board = get_board(LEVEL)
+        grid = Grid.from_level(LEVEL)
+        for _ in range(4):
+            board.rotate()
+            grid.rotate()
+            for box in board.group:
+                tile = grid.get_element(box.x, box.y, box.z)
+                self.assertEqual(
+                    (box.wall_nw, box.wall_ne, box.wall_sw, box.wall_se),
+                    (tile.wall_nw, tile.wall_ne, tile.wall_sw, tile.wall_se))
+
+
+class TestStates(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = Grid.from_level(LEVEL)
+        self.char = Character()
+        self.grid.place_char(self.char, 1, 1, 0)
+        self.ctx = StateContext(ViewState)
+
+    def select_char(self):
+        self.ctx.on_char_selected(
+            CharSelected(self.grid, self.grid.get_element(1, 1, 0)))
+
+    def test_move(self):
+        self.select_char()
+        self.assertIsInstance(self.ctx._state, MoveState)
+        self.assertEqual(set(compute_area(self.grid, 1, 1, 0, 2)),
+                         self.grid.highlighted)
+
+        target = self.grid.get_element(0, 1, 0)
+        self.ctx.on_item_selected(ItemSelected(self.grid, target))
+        self.assertIs(self.char, target.char)
+        self.assertFalse(self.grid.highlighted)
+        self.assertIsInstance(self.ctx._state, ViewState)
+
+    def test_undo_move(self):
+        log = StateLog(self.grid)
+        self.select_char()
+        self.ctx.on_item_selected(
+            ItemSelected(self.grid, self.grid.get_element(0, 1, 0)))
+        log.pop()
+        self.assertIs(self.char, self.grid.get_element(1, 1, 0).char)
+
+    def test_attack(self):
+        self.select_char()
+        self.ctx.on_key_pressed(KeyEvent(self.grid, 'a'))
+        self.assertIsInstance(self.ctx._state, AttackState)
+
+
+class TestStateLog(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = Grid.from_level(LEVEL)
+        self.log = StateLog(self.grid)
+        self.char = Character()
+        self.grid.place_char(self.char, 0, 0, 0)
+
+    def state(self):
+        return ([(tile.x, tile.y, tile.z, tile.wall_nw, tile.wall_ne,
+                  tile.wall_sw, tile.wall_se, tile.char)
+                 for tile in self.grid],
+                (self.char.x, self.char.y, self.char.z))
+
+    def test_nothing_recorded_without_mark(self):
+        self.grid.move_char(self.char, 1, 0, 0)
+        self.assertEqual(0, len(self.log))
+
+    def test_pop(self):
+        before = self.state()
+        self.log.push()
+        self.grid.move_char(self.char, 1, 1, 0)
+        self.grid.rotate()
+        self.grid.move_char(self.char, 0, 0, 0)
+        self.grid.place_char(Character(), 2, 1, 0)
+        self.log.pop()
+        self.assertEqual(before, self.state())
+        self.assertEqual(0, self.log.rotation)
+        self.assertEqual(0, len(self.log))
+
+    def test_nested(self):
+        self.log.push()
+        self.grid.move_char(self.char, 1, 0, 0)
+        middle = self.state()
+        self.log.push()
+        self.grid.move_char(self.char, 2, 0, 0)
+        self.log.pop()
+        self.assertEqual(middle, self.state())
+        self.log.push()
+        self.grid.rotate()
+        self.log.commit()
+        self.log.pop()
+        self.assertIs(self.char, self.grid.get_element(0, 0, 0).char)
+        self.assertEqual(0, self.log.depth)
+
+    def test_snapshot(self):
+        snapshot = self.log.snapshot()
+        before = self.state()
+        self.grid.rotate()
+        self.grid.move_char(self.char, 2, 2, 0)
+        self.log.restore(snapshot)
+        self.assertEqual(before, self.state())
+
+    def test_board(self):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        from pg_iso.board import Char
+        from pg_iso.__main__ import get_board
+
+        board = get_board(LEVEL)
+        log = StateLog(board)
+        char = Char(0, 0, 0, (212, 23, 132))
+        board.place_char(char, 0, 0, 0)
+        walls = [(box.x, box.y, box.wall_nw, box.wall_ne)
+                 for box in board.group]
+        log.push()
+        board.move_char(char, 1, 0, 0)
+        board.rotate()
+        log.pop()
+        self.assertEqual(0, board.orientation)
+        self.assertEqual(walls, [(box.x, box.y, box.wall_nw, box.wall_ne)
+                                 for box in board.group])
+        self.assertIs(char, board.get_element(0, 0, 0).char)
+        self.assertIsNone(board.get_element(1, 0, 0).char)
+
+    def test_pop_rotation_once(self):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        from pg_iso.__main__ import get_board
+
+        board = get_board(LEVEL)
+        log = StateLog(board)
+        log.push()
+        board.rotate()
+        rotations = []
+        rotate = board.rotate
+        board.rotate = lambda reverse=False: (rotations.append(reverse),
+                                              rotate(reverse))
+        log.pop()
+        self.assertEqual([True], rotations)
+        self.assertEqual((0, 0), (board.orientation, log.rotation))
+
+    def test_grid_rotate_reverse(self):
+        grid = Grid.from_level(LEVEL)
+        before = self.state()
+        self.grid.rotate()
+        self.grid.rotate(reverse=True)
+        self.assertEqual(before, self.state())
+        grid.rotate(reverse=True)
+        for _ in range(3):
+            self.grid.rotate()
+        self.assertEqual(
+            [(tile.x, tile.y, tile.z, tile.wall_nw, tile.wall_ne)
+             for tile in grid],
+            [(tile.x, tile.y, tile.z, tile.wall_nw, tile.wall_ne)
+             for tile in self.grid])
+
+    def test_board_place_cubes(self):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        from pg_iso.__main__ import get_board
+
+        board = get_board(LEVEL)
+        log = StateLog(board)
+        board.rotate()
+        log.push()
+        board.rotate()
+        board._place_cubes()
+        self.assertEqual((0, 0, 0), (log.rotation, log.depth, len(log)))
+        snapshot = log.snapshot()
+        board.rotate()
+        log.restore(snapshot)
+        self.assertEqual(0, board.orientation)
+
+
+class TestColumns(unittest.TestCase):
+
+    def test_top(self):
+        grid = Grid([Tile(0, 0, 0), Tile(0, 0, 2), Tile(1, 0, 0)])
+        self.assertEqual([0, 2], grid.column(0, 0))
+        self.assertEqual(2, grid.top(0, 0).z)
+        self.assertIsNone(grid.top(2, 0))
+
+    def test_landing(self):
+        grid = Grid([Tile(0, 0, 0), Tile(0, 0, 1), Tile(0, 0, 3)])
+        # The tile at 0 is under the one at 1.
+        self.assertIsNone(grid.landing(0, 0, 0))
+        self.assertEqual(1, grid.landing(0, 0, 0, max_climb=1).z)
+        self.assertEqual(1, grid.landing(0, 0, 2, max_drop=1).z)
+        self.assertEqual(3, grid.landing(0, 0, 2, max_climb=1).z)
+
+    def test_rotate(self):
+        grid = Grid([Tile(0, 0, 0), Tile(0, 1, 1)])
+        grid.rotate()
+        self.assertEqual(1, grid.top(0, 0).z)
+        self.assertEqual(0, grid.top(1, 0).z)
+
+    def test_board_place_item(self):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        from pg_iso.board import BoardBox
+        from pg_iso.__main__ import get_board
+
+        board = get_board(LEVEL)
+        box = BoardBox(0, 0, 0, (23, 76, 96))
+        board.place_item(box, 1, 1, 1)
+        self.assertIs(box, board.top(1, 1))
+        board.place_item(box, 2, 1, 1)
+        self.assertEqual(0, board.top(1, 1).z)
+        self.assertIs(box, board.top(2, 1))
+        board.rotate()
+        self.assertIs(box, board.top(box.x, box.y))
+        board.remove_item(box)
+        self.assertEqual(0, board.top(box.x, box.y).z)
+
+
+class TestCellMasks(unittest.TestCase):
+
+    def assert_synced(self, grid):
+        for tile in grid:
+            self.assertEqual(tile_mask(tile),
+                             grid.masks.get(tile.x, tile.y, tile.z))
+        self.assertEqual(len(grid), (grid.masks.cells != 0).sum())
+
+    def test_rebuild(self):
+        masks = CellMasks([Tile(1, 2, 0), Tile(3, 2, 1)])
+        self.assertEqual((1, 2, 0), masks.origin)
+        self.assertEqual((3, 1, 2), masks.cells.shape)
+        self.assertEqual(0, masks.get(0, 0, 0))
+
+    def test_grid(self):
+        grid = Grid.from_level(LEVEL)
+        log = StateLog(grid)
+        char = Character()
+        grid.place_char(char, 0, 0, 0)
+        self.assertEqual(OCCUPIED, grid.masks.get(0, 0, 0) & OCCUPIED)
+        log.push()
+        grid.move_char(char, 1, 1, 0)
+        self.assert_synced(grid)
+        for _ in range(4):
+            grid.rotate()
+            self.assert_synced(grid)
+        log.pop()
+        self.assert_synced(grid)
+
+    def test_can_move(self):
+        grid = Grid.from_level(LEVEL)
+        grid.place_char(Character(), 1, 1, 0)
+        grid.rotate()
+        for tile in grid:
+            for dx, dy in DIRECTIONS:
+                self.assertEqual(
+                    can_move(tile, grid.get_element(
+                        tile.x + dx, tile.y + dy, 0), dx, dy),
+                    grid.masks.can_move(tile.x, tile.y, 0, dx, dy, 0))
+
+    def test_board(self):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        from pg_iso.board import BoardBox, Char
+        from pg_iso.__main__ import get_board
+
+        board = get_board(LEVEL)
+        board.place_char(Char(0, 0, 0, (212, 23, 132)), 2, 0, 0)
+        box = BoardBox(0, 0, 0, (23, 76, 96))
+        box.wall_se = True
+        board.place_item(box, 5, 1, 1)
+        self.assert_synced(board)
+        for _ in range(4):
+            board.rotate()
+            self.assert_synced(board)
+        board.place_item(box, 1, 1, 1)
+        self.assert_synced(board)
+        board.remove_item(box)
+        self.assert_synced(board)
+
+    def test_board_not_at_origin(self):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        from pg_iso.board import BoardBox
+        from pg_iso.__main__ import get_board
+
+        board = get_board(LEVEL)
+        for box in [box for box in board.group if box.x == 0]:
+            board.remove_item(box)
+        for _ in range(5):
+            board.rotate()
+            self.assert_synced(board)
+
+        board.place_item(BoardBox(0, 0, 0, (23, 76, 96)), -2, 1, 0)
+        for _ in range(5):
+            board.rotate()
+            self.assert_synced(board)
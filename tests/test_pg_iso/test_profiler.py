@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from pg_iso.profiler import FrameProfiler, Hud
+
+
+class TestFrameProfiler(unittest.TestCase):
+
+    def test_end_frame(self):
+        profiler = FrameProfiler()
+        with profiler.phase('draw'):
+            pass
+        with profiler.phase('draw'):
+            pass
+        profiler.count('tiles_redrawn', 3)
+        profiler.count('tiles_redrawn')
+
+        frame = profiler.end_frame()
+        self.assertEqual(0, frame['frame'])
+        self.assertEqual(['draw'], list(frame['phases']))
+        self.assertEqual({'tiles_redrawn': 4}, frame['counters'])
+        self.assertIs(frame, profiler.last_frame)
+
+        frame = profiler.end_frame()
+        self.assertEqual({'frame': 1, 'phases': {}, 'counters': {}}, frame)
+
+    def test_trace(self):
+        profiler = FrameProfiler()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'trace.jsonl')
+            profiler.open_trace(path)
+            profiler.count('sprites_blitted', 2)
+            profiler.end_frame()
+            profiler.end_frame()
+            profiler.close_trace()
+
+            with open(path) as file:
+                frames = [json.loads(line) for line in file]
+
+        self.assertEqual([0, 1], [frame['frame'] for frame in frames])
+        self.assertEqual({'sprites_blitted': 2}, frames[0]['counters'])
+
+    def test_milestone(self):
+        profiler = FrameProfiler()
+        profiler.milestone('first_frame')
+        first = profiler.milestones['first_frame']
+        profiler.milestone('first_frame')
+        self.assertEqual({'first_frame': first}, profiler.milestones)
+        self.assertEqual({'first_frame': first},
+                         profiler.end_frame()['milestones'])
+        self.assertNotIn('milestones', profiler.end_frame())
+
+
+class TestHud(unittest.TestCase):
+
+    def test_draw(self):
+        profiler = FrameProfiler()
+        with profiler.phase('draw'):
+            pass
+        profiler.end_frame()
+
+        surface = pygame.Surface((300, 300))
+        rect = Hud(profiler, (10, 10)).draw(surface, 30.0)
+        self.assertEqual((10, 10), rect.topleft)
+        self.assertGreater(rect.width, 0)
+        self.assertGreater(rect.height, 0)
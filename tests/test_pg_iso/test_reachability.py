@@ -0,0 +1,128 @@
+import os
+import unittest
+from textwrap import dedent
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from pg_iso.board import Board, BoardBox, Char
+from pg_iso.model import Grid, Tile
+from pg_iso.reachability import compute_area, compute_reachable
+
+
+def make_board(level):
+
+    def ground(x, y, z):
+        return BoardBox(x, y, z, (23, 76, 96))
+
+    def ground_with_x_wall(x, y, z):
+        box = BoardBox(x, y, z, (23, 76, 96))
+        box.wall_nw = True
+        return box
+
+    def ground_with_y_wall(x, y, z):
+        box = BoardBox(x, y, z, (23, 76, 96))
+        box.wall_ne = True
+        return box
+
+    return Board(level, {'w': ground,
+                         'x': ground_with_x_wall,
+                         'y': ground_with_y_wall})
+
+
+class TestComputeReachable(unittest.TestCase):
+
+    def test_each_box_once(self):
+        board = make_board(dedent("""\
+        wwwww
+        wwwww
+        wwwww
+        """))
+        area = compute_area(board, 2, 1, 0, 3)
+        self.assertEqual(len(area), len(set(area)))
+        self.assertEqual(
+            {(0, 0), (1, 0), (2, 0), (3, 0), (4, 0),
+             (0, 1), (1, 1), (3, 1), (4, 1),
+             (0, 2), (1, 2), (2, 2), (3, 2), (4, 2)},
+            {(box.x, box.y) for box in area})
+
+    def test_distance_and_path(self):
+        board = make_board(dedent("""\
+        wwww
+        wwww
+        """))
+        reachable = compute_reachable(board, 0, 0, 0, 10)
+        target = board.get_element(3, 1, 0)
+        self.assertEqual(4, reachable.distance[target])
+        path = reachable.path_to(target)
+        self.assertEqual(4, len(path))
+        self.assertIs(target, path[-1])
+        for previous, box in zip([reachable.start] + path, path):
+            self.assertEqual(1, abs(previous.x - box.x) +
+                             abs(previous.y - box.y))
+
+    def test_wall_blocks(self):
+        board = make_board(dedent("""\
+        wyw
+        """))
+        reachable = compute_reachable(board, 0, 0, 0, 5)
+        self.assertEqual({(1, 0)}, {(box.x, box.y) for box in reachable})
+
+    def test_wall_of_next_box_blocks(self):
+        board = make_board(dedent("""\
+        w
+        x
+        """))
+        reachable = compute_reachable(board, 0, 0, 0, 5)
+        self.assertEqual(0, len(reachable))
+
+    def test_char_blocks(self):
+        board = make_board(dedent("""\
+        www
+        """))
+        board.place_char(Char(0, 0, 0, (212, 23, 132)), 1, 0, 0)
+        reachable = compute_reachable(board, 0, 0, 0, 5)
+        self.assertEqual(0, len(reachable))
+
+    def test_move_cost(self):
+        board = make_board(dedent("""\
+        www
+        www
+        """))
+        expensive = board.get_element(1, 0, 0)
+        reachable = compute_reachable(
+            board, 0, 0, 0, 4,
+            cost=lambda box: 5 if box is expensive else 1)
+        self.assertNotIn(expensive, reachable)
+        self.assertEqual(4, reachable.distance[board.get_element(2, 0, 0)])
+
+
+def make_stairs():
+    # Ground from x = 0 to 3, a step on x = 2 and a tower on x = 3.
+    positions = [(x, 0, 0) for x in range(4)] + \
+        [(2, 0, 1), (3, 0, 1), (3, 0, 2)]
+    return Grid([Tile(*position) for position in positions])
+
+
+class TestLevels(unittest.TestCase):
+
+    def test_climb(self):
+        grid = make_stairs()
+        reachable = compute_reachable(grid, 0, 0, 0, 10)
+        self.assertEqual({(1, 0, 0): 1, (2, 0, 1): 3, (3, 0, 2): 5},
+                         {(box.x, box.y, box.z): distance
+                          for box, distance in reachable.distance.items()
+                          if box is not reachable.start})
+
+    def test_climb_limit(self):
+        grid = make_stairs()
+        reachable = compute_reachable(grid, 0, 0, 0, 10, max_climb=0)
+        self.assertEqual([(1, 0, 0)],
+                         [(box.x, box.y, box.z) for box in reachable])
+
+    def test_drop(self):
+        grid = make_stairs()
+        reachable = compute_reachable(grid, 3, 0, 2, 10, drop_cost=2)
+        self.assertEqual(3, reachable.distance[grid.get_element(2, 0, 1)])
+        self.assertEqual(6, reachable.distance[grid.get_element(1, 0, 0)])
+        reachable = compute_reachable(grid, 3, 0, 2, 10, max_drop=0)
+        self.assertEqual(0, len(reachable))
@@ -0,0 +1,93 @@
+import random
+import unittest
+from textwrap import dedent
+
+from pg_iso.model import Character, Grid, Tile
+from pg_iso.reachability import compute_reachable
+from pg_iso.threat import TileArrays, compute_threats
+
+
+LEVEL = dedent("""
+yxbw
+wwyw
+wxxw
+""")
+
+
+def random_grid(seed):
+    rng = random.Random(seed)
+    tiles = []
+    for x in range(6):
+        for y in range(5):
+            for z in range(rng.randrange(1, 4)):
+                if z and rng.random() < 0.3:
+                    continue
+                tile = Tile(x, y, z)
+                for wall in ('wall_nw', 'wall_ne', 'wall_sw', 'wall_se'):
+                    if rng.random() < 0.1:
+                        setattr(tile, wall, True)
+                tiles.append(tile)
+    return Grid(tiles)
+
+
+class TestTileArrays(unittest.TestCase):
+
+    def test_arrays(self):
+        grid = Grid([Tile(1, 0, 0), Tile(1, 0, 1), Tile(2, 1, 0)])
+        grid.get_element(2, 1, 0).wall_se = True
+        grid.masks.update(grid.get_element(2, 1, 0))
+        arrays = TileArrays(grid)
+        self.assertEqual((1, 0, 0), arrays.origin)
+        self.assertEqual((2, 2, 2), arrays.shape)
+        self.assertEqual(3, arrays.present.sum())
+        self.assertFalse(arrays.standable[0, 0, 0])
+        self.assertTrue(arrays.standable[0, 0, 1])
+        self.assertEqual(8, arrays.walls[1, 1, 0])
+
+
+class TestComputeThreats(unittest.TestCase):
+
+    def assert_same_distances(self, grid, chars, nb_steps, **rules):
+        threats = compute_threats(grid, chars, nb_steps, **rules)
+        for number, char in enumerate(chars):
+            reachable = compute_reachable(grid, char.x, char.y, char.z,
+                                          nb_steps, **rules)
+            expected = {(box.x, box.y, box.z): distance
+                        for box, distance in reachable.distance.items()}
+            reached = threats.tiles(grid, threats.reach[number])
+            self.assertEqual(
+                expected,
+                {(box.x, box.y, box.z): threats.distance[
+                    (number,) + threats.arrays.index(box.x, box.y, box.z)]
+                 for box in reached})
+
+    def test_same_as_compute_reachable(self):
+        grid = Grid.from_level(LEVEL)
+        chars = [Character(), Character()]
+        grid.place_char(chars[0], 0, 0, 0)
+        grid.place_char(chars[1], 2, 1, 0)
+        self.assert_same_distances(grid, chars, 3)
+
+    def test_levels(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                grid = random_grid(seed)
+                chars = []
+                for box in random.Random(seed).sample(list(grid), 3):
+                    top = grid.top(box.x, box.y)
+                    if top.char is None:
+                        chars.append(Character())
+                        grid.place_char(chars[-1], top.x, top.y, top.z)
+                self.assert_same_distances(grid, chars, 4)
+                self.assert_same_distances(grid, chars, 4, max_drop=1,
+                                           climb_cost=2, drop_cost=1)
+
+    def test_attack(self):
+        grid = Grid([Tile(x, 0, 0) for x in range(8)])
+        char = Character()
+        grid.place_char(char, 0, 0, 0)
+        threats = compute_threats(grid, [char], nb_steps=2, attack_range=3)
+        self.assertEqual(list(range(6)),
+                         [tile.x for tile in threats.tiles(grid)])
+        self.assertEqual(1, threats.threat()[5, 0, 0])
+        self.assertEqual(0, threats.threat()[6, 0, 0])